@@ -0,0 +1,69 @@
+"""
+Serialisation microbenchmark for the image endpoints.
+
+Compares the old path (jsonable_encoder + stdlib json on an ad-hoc dict)
+against the typed response models rendered with orjson, on payload sizes
+we actually send: one 1024x1024 PNG, three of them, and a 4K sana-1.5 render.
+
+Run from the repo root:
+    python -m backend.benchmarks.serialization_bench
+"""
+import base64
+import json
+import os
+import time
+
+from fastapi.encoders import jsonable_encoder
+
+from backend.models.schema import GeneratedImagesResponse
+from backend.utils.fast_json import ORJSONResponse
+
+# Approximate PNG sizes before base64 encoding
+PAYLOADS = {
+    "1x 1024x1024 (~1.2 MB)": [1_200_000],
+    "3x 1024x1024 (~3.6 MB)": [1_200_000] * 3,
+    "1x 4096x4096 (~18 MB)": [18_000_000],
+}
+
+REPEATS = int(os.getenv("BENCH_REPEATS", "20"))
+
+
+def _fake_images(sizes):
+    # Random bytes keep base64 output realistic (no long runs of identical chars)
+    return [base64.b64encode(os.urandom(size)).decode("utf-8") for size in sizes]
+
+
+def _time(fn):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn()
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def old_path(images):
+    content = {
+        "status": "success",
+        "images": images,
+        "message": f"{len(images)} images generated successfully.",
+    }
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False).encode("utf-8")
+
+
+def new_path(images):
+    model = GeneratedImagesResponse(images=images, message=f"{len(images)} images generated successfully.")
+    return ORJSONResponse(model.model_dump(exclude_none=True)).body
+
+
+def main():
+    print(f"{'payload':<26}{'stdlib (ms)':>14}{'orjson (ms)':>14}{'speed-up':>10}")
+    for label, sizes in PAYLOADS.items():
+        images = _fake_images(sizes)
+        assert json.loads(old_path(images)) == json.loads(new_path(images))
+        old_ms = _time(lambda: old_path(images))
+        new_ms = _time(lambda: new_path(images))
+        print(f"{label:<26}{old_ms:>14.2f}{new_ms:>14.2f}{old_ms / new_ms:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,53 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from backend.models.schema import PosterRequest, PosterImageRequest, TextToImageRequest
-from backend.utils.llama_generate_fields import call_llama_generate_fields
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from backend.models.schema import (
+    PosterRequest, PosterImageRequest, TextToImageRequest, ProgressiveImageRequest, MultiFormatImageRequest,
+    PosterFields, RegenerateFieldsRequest, CombinedPosterRequest,
+    PosterFieldsResponse, PosterImageResponse, PosterVariantResponse, GeneratedImagesResponse, MultiFormatImagesResponse,
+    StatusResponse, HealthResponse,
+)
+from backend.utils.llama_generate_fields import call_llama_generate_fields, call_llama_regenerate_fields
 from backend.utils.prompt_builder import build_image_generation_prompt
 from backend.utils.prompt_refiner import refine_prompt_through_god_template
-from backend.utils.image_generator import generate_poster_image
-from backend.utils.extended_image_generator import generate_image
+from backend.utils.extended_image_generator import PREVIEW_MODEL, generate_image, generate_poster_image, generate_preview_image
 from backend.utils.enhance_prompt import enhance_prompt
+from backend.utils.quota import identify_tenant, image_scheduler, is_admin, preview_enabled, quota_manager, usage_ledger
+from backend.utils.fast_json import ORJSONResponse, model_response, sse_event
+from backend.utils.profiling import PROFILING_ENABLED, profile_store, profiling_middleware
+from backend.utils.intent_classifier import agreement_tracker
+from backend.utils.speculation import SPECULATION_ENABLED, speculation_cache
+from backend.utils.plan_validator import ASPECT_SIZES
+from backend.utils.reframe import reframe_all, shutdown_pool
+from backend.utils.admission import AdmissionTicket, Overloaded, limiters
+from backend.utils.structured_logging import (
+    REQUEST_ID_HEADER, Payload, configure_logging, request_id_middleware,
+)
+from backend.utils.deadline import (
+    DEADLINE_HEADER, DeadlineExceeded, deadline_for, reset_current_deadline, set_current_deadline, watch_disconnect,
+)
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-import json
-import os
+from typing import Optional
+import asyncio
+import logging
+import time
 
 
 load_dotenv()
 
-app = FastAPI()
+configure_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # 🧹 Stop the reframing worker processes
+    await run_in_threadpool(shutdown_pool)
+
+app = FastAPI(default_response_class=ORJSONResponse, lifespan=lifespan)
 
 # ✅ Allow frontend (Angular) to call backend
 app.add_middleware(
@@ -23,87 +56,478 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After", "X-Quota-Images-Remaining", "X-Quota-Llm-Remaining", "X-Quota-Previews-Remaining",
+                    "X-Profile-Id", REQUEST_ID_HEADER],
 )
 
+# 🔬 Opt-in sampling profiler for slow or X-Profile-marked requests
+if PROFILING_ENABLED:
+    app.middleware("http")(profiling_middleware)
+
+# 🏷️ Outermost, so every log line and task of a request carries its X-Request-ID
+app.middleware("http")(request_id_middleware)
+
+# 🛡️ Admin endpoints require X-Admin-Token matching ADMIN_TOKEN (and are closed while it is unset)
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+# 🔑 Resolve the calling tenant from X-API-Key (anonymous callers are keyed by IP)
+def get_tenant(request: Request, x_api_key: Optional[str] = Header(default=None)) -> str:
+    client_host = request.client.host if request.client else None
+    tenant = identify_tenant(x_api_key, client_host)
+    if tenant is None:
+        raise HTTPException(status_code=401, detail="Unknown API key.")
+    return tenant
+
+# 🪣 Take tokens from the tenant's buckets and report what is left in the headers
+def enforce_quota(tenant: str, response: Response, **units) -> dict:
+    result = quota_manager.consume(tenant, units)
+    if not result.satisfiable:
+        logger.warning("⛔ [quota] Tenant %s asked for more than its burst allows: %s", tenant, units)
+        raise HTTPException(status_code=400, detail="Request exceeds the per-request quota limit.", headers=result.headers())
+    if not result.allowed:
+        logger.warning("⛔ [quota] Tenant %s over quota for %s", tenant, units)
+        raise HTTPException(status_code=429, detail="Quota exceeded, try again later.", headers=result.headers())
+    response.headers.update(result.headers())
+    return result.headers()
+
+# ⏱️ End-to-end budget for the request, visible to every pipeline stage; cancelled if the client leaves
+async def request_deadline(request: Request, x_request_deadline_ms: Optional[str] = Header(default=None)):
+    deadline = deadline_for(request.url.path, x_request_deadline_ms)
+    token = set_current_deadline(deadline)
+    watcher = asyncio.create_task(watch_disconnect(request, deadline))
+    try:
+        yield deadline
+    finally:
+        watcher.cancel()
+        reset_current_deadline(token)
+
+# 🚦 Admission control: bounded concurrency per endpoint class, fast 503 once the wait queue is full
+async def acquire_or_shed(endpoint_class: str):
+    try:
+        await limiters[endpoint_class].acquire()
+    except Overloaded as e:
+        logger.warning("🚦 [admission] Shedding %s request, retry after %ss", endpoint_class, e.retry_after)
+        raise HTTPException(status_code=503, detail="Server is busy, try again shortly.",
+                            headers={"Retry-After": str(e.retry_after)})
+
+async def admit_stream(endpoint_class: str) -> AdmissionTicket:
+    # For streaming responses: the slot is held until the stream ends (or is abandoned)
+    await acquire_or_shed(endpoint_class)
+    return AdmissionTicket(limiters[endpoint_class])
+
+def admit(endpoint_class: str):
+    limiter = limiters[endpoint_class]
+
+    async def dependency():
+        await acquire_or_shed(endpoint_class)
+
+        start = time.perf_counter()
+        # None: a client error (invalid body, quota) that did no real work and says nothing about latency
+        success = True
+        try:
+            yield
+        except RequestValidationError:
+            success = None
+            raise
+        except HTTPException as e:
+            success = None if e.status_code < 500 else False
+            raise
+        except Exception:
+            success = False
+            raise
+        finally:
+            if success is None:
+                limiter.abandon()
+            else:
+                limiter.release(time.perf_counter() - start, success)
+
+    return dependency
+
 # 🧠 Step 1: Generate Poster Fields using Groq LLaMA
-@app.post("/generate-fields")
-async def generate_fields(data: PosterRequest):
+@app.post("/generate-fields", response_model=PosterFieldsResponse, dependencies=[Depends(admit("llm")), Depends(request_deadline)])
+async def generate_fields(data: PosterRequest, response: Response, tenant: str = Depends(get_tenant)):
+   enforce_quota(tenant, response, llm=1)
    try:
-       print("\n📥 [generate-fields] Received POST with data:", data)
+       logger.debug("📥 [generate-fields] Received POST with data: %s", Payload(data))
 
        # 🔁 Call Groq (LLaMA) to generate fields - now returns dict directly!
-       parsed_json = call_llama_generate_fields(data)
-       print("🧠 [generate-fields] Parsed data from LLaMA:\n", parsed_json)
+       parsed_json = await run_in_threadpool(call_llama_generate_fields, data)
+       logger.debug("🧠 [generate-fields] Parsed data from LLaMA: %s", Payload(parsed_json))
+
+       fields = PosterFields.model_validate(parsed_json) if parsed_json else None
+
+       # 🔮 Opt-in: start rendering the poster now, on the bet that /generate-poster follows
+       speculation_token = None
+       if SPECULATION_ENABLED and data.speculate and fields is not None:
+           ticket = speculation_cache.reserve()
+           if ticket is not None:
+               quota = quota_manager.consume(tenant, {"images": 1})
+               if quota.allowed:
+                   response.headers.update(quota.headers())
+                   speculation_token = speculation_cache.start(tenant, fields, ticket)
+               else:
+                   ticket.abandon()
 
        # ✅ Return clean object to frontend
-       return {
-           "status": "success",
-           "data": parsed_json,
-           "message": "Poster fields generated using LLaMA."
-       }
+       return model_response(PosterFieldsResponse(
+           data=fields,
+           message="Poster fields generated using LLaMA.",
+           speculation_token=speculation_token
+       ), response)
+
+   except DeadlineExceeded as e:
+       logger.warning("⏱️ [generate-fields] Deadline: %s", e)
+       raise HTTPException(status_code=504, detail=str(e))
 
    except Exception as e:
-       print("❌ [generate-fields] General error:", str(e))
+       logger.exception("❌ [generate-fields] General error: %s", e)
        raise HTTPException(status_code=500, detail=f"LLaMA field generation failed: {str(e)}")
 
+# ✏️ Step 1b: Regenerate only the fields the user wants changed
+@app.post("/regenerate-fields", response_model=PosterFieldsResponse, dependencies=[Depends(admit("llm")), Depends(request_deadline)])
+async def regenerate_fields(data: RegenerateFieldsRequest, response: Response, tenant: str = Depends(get_tenant)):
+    enforce_quota(tenant, response, llm=1)
+    try:
+        logger.info("✏️ [regenerate-fields] Regenerating: %s", data.regenerate)
+
+        merged = await run_in_threadpool(
+            call_llama_regenerate_fields, data.fields, data.regenerate, data.main_prompt, data.theme
+        )
+        logger.debug("🧠 [regenerate-fields] Merged fields: %s", Payload(merged))
+
+        return model_response(PosterFieldsResponse(
+            data=merged,
+            message=f"Regenerated {', '.join(data.regenerate)}."
+        ), response)
+
+    except DeadlineExceeded as e:
+        logger.warning("⏱️ [regenerate-fields] Deadline: %s", e)
+        raise HTTPException(status_code=504, detail=str(e))
+
+    except Exception as e:
+        logger.exception("❌ [regenerate-fields] General error: %s", e)
+        raise HTTPException(status_code=500, detail=f"LLaMA field regeneration failed: {str(e)}")
+
 # 🖼️ Step 2: Generate Final Poster Image
-@app.post("/generate-poster")
-async def generate_poster(data: PosterImageRequest):
+@app.post("/generate-poster", response_model=PosterImageResponse, dependencies=[Depends(admit("image")), Depends(request_deadline)])
+async def generate_poster(data: PosterImageRequest, response: Response, tenant: str = Depends(get_tenant)):
+    # 🔮 Attach to a matching speculative render (already paid for at /generate-fields)
+    speculative_job = speculation_cache.claim(tenant, data.fields, data.speculation_token) if SPECULATION_ENABLED else None
+    if speculative_job is None:
+        enforce_quota(tenant, response, images=1)
+    else:
+        response.headers["X-Speculation"] = "hit"
     try:
-        print("\n🎨 [generate-poster] Received fields for poster generation:", data.fields)
+        if speculative_job is not None:
+            try:
+                base64_img = await speculative_job.task
+                usage_ledger.record(tenant, "images", 1)
+                return model_response(PosterImageResponse(
+                    image_base64=base64_img,
+                    message="Poster image generated successfully."
+                ), response)
+            except Exception as e:
+                logger.warning("⚠️ [generate-poster] Speculative render failed, generating again: %s", e)
+
+        logger.debug("🎨 [generate-poster] Received fields for poster generation: %s", Payload(data.fields))
 
         # 🧱 Step 1: Build raw prompt from fields
         raw_prompt = build_image_generation_prompt(data.fields)
-        print("📝 [generate-poster] Raw Prompt:\n", raw_prompt)
+        logger.debug("📝 [generate-poster] Raw Prompt: %s", Payload(raw_prompt))
 
         # 🖼️ Step 2: Generate base64 poster image
-        base64_img = generate_poster_image(raw_prompt)
-        print("✅ [generate-poster] Poster image generated. Base64 length:", len(base64_img))
+        async with image_scheduler.slot(tenant):
+            base64_img = await run_in_threadpool(generate_poster_image, raw_prompt)
+        usage_ledger.record(tenant, "images", 1)
+        logger.info("✅ [generate-poster] Poster image generated. Base64 length: %d", len(base64_img))
 
-        return {
-            "status": "success",
-            "image_base64": base64_img,
-            "message": "Poster image generated successfully."
-        }
+        return model_response(PosterImageResponse(
+            image_base64=base64_img,
+            message="Poster image generated successfully."
+        ), response)
+
+    except DeadlineExceeded as e:
+        logger.warning("⏱️ [generate-poster] Deadline: %s", e)
+        raise HTTPException(status_code=504, detail=str(e))
 
     except Exception as e:
-        print("❌ [generate-poster] Image generation error:", str(e))
+        logger.exception("❌ [generate-poster] Image generation error: %s", e)
         raise HTTPException(status_code=500, detail="Poster image generation failed.")
 
+# 🧩 Step 2b: Fields + poster in one request, with K variants streamed as each one finishes (SSE)
+@app.post("/posters")
+async def generate_posters(data: CombinedPosterRequest, request: Request, response: Response, tenant: str = Depends(get_tenant)):
+    # Variants share the base custom_prompt, so it is never regenerated
+    variant_fields = [
+        [name for name in variant.regenerate if name != "custom_prompt"]
+        + (["suggested_theme"] if variant.theme and "suggested_theme" not in variant.regenerate else [])
+        for variant in data.variants
+    ]
+    llm_calls = 1 + sum(1 for names in variant_fields if names)
+
+    # Admission and deadline span the whole stream, as in /generate-images/stream; shed before charging
+    ticket = await admit_stream("image")
+    try:
+        quota_headers = enforce_quota(tenant, response, images=1 + len(data.variants), llm=llm_calls)
+    except HTTPException:
+        ticket.abandon()
+        raise
+    deadline = deadline_for(request.url.path, request.headers.get(DEADLINE_HEADER))
+
+    async def render(index: int, fields: PosterFields, names: list, theme: Optional[str]):
+        try:
+            if names:
+                fields = await run_in_threadpool(call_llama_regenerate_fields, fields, names, data.main_prompt, theme)
+            raw_prompt = build_image_generation_prompt(fields)
+            async with image_scheduler.slot(tenant):
+                base64_img = await run_in_threadpool(generate_poster_image, raw_prompt)
+            usage_ledger.record(tenant, "images", 1)
+            return sse_event("variant", PosterVariantResponse(index=index, fields=fields, image_base64=base64_img))
+        except DeadlineExceeded as e:
+            logger.warning("⏱️ [posters] Variant %d deadline: %s", index, e)
+            return sse_event("variant_error", {"index": index, "status_code": 504, "detail": str(e)})
+        except Exception as e:
+            logger.exception("❌ [posters] Variant %d failed: %s", index, e)
+            return sse_event("variant_error", {"index": index, "status_code": 500, "detail": "Poster variant generation failed."})
+
+    async def events():
+        # Set inside the stream's own task so threadpool stages and variant tasks see it
+        set_current_deadline(deadline)
+        tasks = []
+        try:
+            logger.debug("📥 [posters] Received POST with data: %s", Payload(data))
+
+            # Step 1: Fields once; every variant starts from them
+            parsed_json = await run_in_threadpool(call_llama_generate_fields, data)
+            if not parsed_json:
+                raise ValueError("LLaMA returned no usable fields")
+            fields = PosterFields.model_validate(parsed_json)
+            yield sse_event("fields", PosterFieldsResponse(data=fields, message="Poster fields generated using LLaMA."))
+
+            # Step 2: Base poster and variants concurrently, each streamed as soon as it is ready
+            tasks = [asyncio.ensure_future(render(0, fields, [], None))]
+            tasks += [
+                asyncio.ensure_future(render(index, fields, names, variant.theme))
+                for index, (variant, names) in enumerate(zip(data.variants, variant_fields), start=1)
+            ]
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+
+            yield sse_event("done", {"variants": len(tasks)})
+
+        except DeadlineExceeded as e:
+            ticket.success = False
+            logger.warning("⏱️ [posters] Deadline: %s", e)
+            yield sse_event("error", {"status_code": 504, "detail": str(e)})
+
+        except Exception as e:
+            ticket.success = False
+            logger.exception("❌ [posters] Error: %s", e)
+            yield sse_event("error", {"status_code": 500, "detail": f"LLaMA field generation failed: {str(e)}"})
+
+        finally:
+            # Client gone or stream aborted: stop whatever is still rendering
+            deadline.cancel()
+            for task in tasks:
+                task.cancel()
+            ticket.release()
+
+    headers = {**quota_headers, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
 # 🖼️ Step 3: Generate Images from Prompt
-@app.post("/generate-images")
-async def generate_images(data: TextToImageRequest):
+@app.post("/generate-images", response_model=GeneratedImagesResponse, dependencies=[Depends(admit("image")), Depends(request_deadline)])
+async def generate_images(data: TextToImageRequest, response: Response, tenant: str = Depends(get_tenant)):
+    # Cap at 3 images before charging the tenant's quota
+    data.count = min(data.count, 3)
+    enforce_quota(tenant, response, images=data.count, llm=1)
     try:
-        print("\n📥 [generate-images] Received POST with data:", data)
+        logger.debug("📥 [generate-images] Received POST with data: %s", Payload(data))
 
         # Step 1: Enhance the prompt via Kimi
-        print("prepping raw payload to kimi k2")
-        enhanced_data = enhance_prompt(
+        enhanced_data = await run_in_threadpool(
+            enhance_prompt,
             user_prompt=data.main_prompt,
             aspect_ratio=data.aspect_ratio,
         )
 
-        print("✨ [generate-images] Enhanced Data:\n", json.dumps(enhanced_data, indent=2, ensure_ascii=False))
+        logger.debug("✨ [generate-images] Enhanced Data: %s", Payload(enhanced_data))
+
+        # Step 2: Generate images, fairly scheduled against other tenants
+        async with image_scheduler.slot(tenant, cost=data.count):
+            images = await run_in_threadpool(generate_image, enhanced_data, count=data.count)
+        usage_ledger.record(tenant, "images", len(images))
 
-        # Step 2: Generate images, capped at 3
-        data.count = min(data.count, 3)
-        images = generate_image(enhanced_data, count=data.count)
+        return model_response(GeneratedImagesResponse(
+            images=images,
+            message=f"{len(images)} images generated successfully."
+        ), response)
 
-        return {
-            "status": "success",
-            "images": images,
-            "message": f"{len(images)} images generated successfully."
-        }
+    except DeadlineExceeded as e:
+        logger.warning("⏱️ [generate-images] Deadline: %s", e)
+        raise HTTPException(status_code=504, detail=str(e))
 
     except Exception as e:
-        print("❌ [generate-images] Error:", str(e))
+        logger.exception("❌ [generate-images] Error: %s", e)
         raise HTTPException(status_code=500, detail="Our models are busy right now, try again later.")
 
+# 🎞️ Step 3b: Progressive delivery - a fast preview event first, then the final images (SSE)
+@app.post("/generate-images/stream")
+async def generate_images_stream(data: ProgressiveImageRequest, request: Request, response: Response, tenant: str = Depends(get_tenant)):
+    data.count = min(data.count, 3)
+    with_preview = data.preview and preview_enabled(tenant)
+    units = {"images": data.count, "llm": 1}
+    if with_preview:
+        units["previews"] = 1
+
+    # Admission and deadline are handled here rather than as dependencies so they span the whole stream.
+    # Shed before charging, so a 503 costs the tenant nothing.
+    ticket = await admit_stream("image")
+    try:
+        quota_headers = enforce_quota(tenant, response, **units)
+    except HTTPException:
+        # Over quota: no work was done, so give the slot back without a latency sample
+        ticket.abandon()
+        raise
+    deadline = deadline_for(request.url.path, request.headers.get(DEADLINE_HEADER))
+
+    def record_preview(task):
+        if not task.cancelled() and task.exception() is None:
+            usage_ledger.record(tenant, "previews", 1)
+
+    async def events():
+        # Set inside the stream's own task so threadpool stages see it
+        set_current_deadline(deadline)
+        try:
+            logger.debug("📥 [generate-images/stream] Received POST with data: %s", Payload(data))
+            enhanced_data = await run_in_threadpool(
+                enhance_prompt,
+                user_prompt=data.main_prompt,
+                aspect_ratio=data.aspect_ratio,
+            )
+            yield sse_event("plan", {
+                "intent": enhanced_data.get("intent"),
+                "models": [enhanced_data[t]["name"] for t in ("primary_model", "secondary_model", "tertiary_model") if t in enhanced_data]
+            })
+
+            # Preview runs alongside (and isn't queued behind) the primary tier
+            preview_task = None
+            if with_preview:
+                preview_task = asyncio.ensure_future(run_in_threadpool(generate_preview_image, enhanced_data))
+                preview_task.add_done_callback(record_preview)
+
+            async with image_scheduler.slot(tenant, cost=data.count):
+                final_task = asyncio.ensure_future(run_in_threadpool(generate_image, enhanced_data, count=data.count))
+                if preview_task is not None:
+                    await asyncio.wait({preview_task, final_task}, return_when=asyncio.FIRST_COMPLETED)
+                    if preview_task.done() and not final_task.done():
+                        if preview_task.exception() is None:
+                            yield sse_event("preview", {"image_base64": preview_task.result(), "model": PREVIEW_MODEL})
+                        else:
+                            logger.warning("⚠️ [generate-images/stream] Preview failed: %s", preview_task.exception())
+                images = await final_task
+            usage_ledger.record(tenant, "images", len(images))
+
+            yield sse_event("final", GeneratedImagesResponse(
+                images=images,
+                message=f"{len(images)} images generated successfully."
+            ))
+
+        except DeadlineExceeded as e:
+            ticket.success = False
+            logger.warning("⏱️ [generate-images/stream] Deadline: %s", e)
+            yield sse_event("error", {"status_code": 504, "detail": str(e)})
+
+        except Exception as e:
+            ticket.success = False
+            logger.exception("❌ [generate-images/stream] Error: %s", e)
+            yield sse_event("error", {"status_code": 500, "detail": "Our models are busy right now, try again later."})
+
+        finally:
+            # Stop any stage still running in the threadpool if the client went away
+            deadline.cancel()
+            ticket.release()
+
+    headers = {**quota_headers, "Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
 
-@app.get("/")
+# 📐 Step 3c: One generation, every aspect ratio - square master reframed locally
+@app.post("/generate-images/multi-format", response_model=MultiFormatImagesResponse, dependencies=[Depends(admit("image")), Depends(request_deadline)])
+async def generate_images_multi_format(data: MultiFormatImageRequest, response: Response, tenant: str = Depends(get_tenant)):
+    enforce_quota(tenant, response, images=1, llm=1)
+    try:
+        logger.debug("📥 [generate-images/multi-format] Received POST with data: %s", Payload(data))
+
+        # Step 1: Enhance once for a square master; every model supports 1:1
+        enhanced_data = await run_in_threadpool(enhance_prompt, user_prompt=data.main_prompt, aspect_ratio="1:1")
+
+        # Step 2: Generate the master at the model's largest native size
+        async with image_scheduler.slot(tenant):
+            master = (await run_in_threadpool(generate_image, enhanced_data, count=1, native_size=True))[0]
+        usage_ledger.record(tenant, "images", 1)
+
+        # Step 3: Crop/pad every rendition on the CPU process pool
+        sizes = {ratio: ASPECT_SIZES[ratio] for ratio in dict.fromkeys(data.aspect_ratios)}
+        renditions = await reframe_all(master, sizes)
+
+        return model_response(MultiFormatImagesResponse(
+            renditions=renditions,
+            message=f"{len(renditions)} renditions generated from one image."
+        ), response)
+
+    except DeadlineExceeded as e:
+        logger.warning("⏱️ [generate-images/multi-format] Deadline: %s", e)
+        raise HTTPException(status_code=504, detail=str(e))
+
+    except Exception as e:
+        logger.exception("❌ [generate-images/multi-format] Error: %s", e)
+        raise HTTPException(status_code=500, detail="Our models are busy right now, try again later.")
+
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    return {"enabled": PROFILING_ENABLED, "profiles": await run_in_threadpool(profile_store.list)}
+
+@app.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)], response_class=PlainTextResponse)
+async def get_profile(profile_id: str):
+    folded = await run_in_threadpool(profile_store.read, profile_id)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    return PlainTextResponse(folded)
+
+@app.get("/admin/speculation", dependencies=[Depends(require_admin)])
+async def speculation_stats():
+    return speculation_cache.stats()
+
+@app.get("/admin/usage", dependencies=[Depends(require_admin)])
+async def usage():
+    return usage_ledger.snapshot()
+
+@app.get("/admin/intent-stats", dependencies=[Depends(require_admin)])
+async def intent_stats():
+    return agreement_tracker.stats()
+
+
+@app.get("/", response_model=StatusResponse)
 async def root():
     return {"status": "ok", "message": "Backend is running!"}
 
-@app.get("/healthz")
+@app.get("/healthz", response_model=HealthResponse)
 async def health():
-    return {"status": "healthy"}
+    saturated = any(limiter.saturated for limiter in limiters.values())
+    return {
+        "status": "saturated" if saturated else "healthy",
+        "admission": {name: limiter.stats() for name, limiter in limiters.items()}
+    }
+
+# 🚥 Readiness: 503 while saturated so the load balancer drains traffic away
+@app.get("/readyz", response_model=HealthResponse)
+async def ready():
+    saturated = any(limiter.saturated for limiter in limiters.values())
+    content = {
+        "status": "saturated" if saturated else "healthy",
+        "admission": {name: limiter.stats() for name, limiter in limiters.items()}
+    }
+    return ORJSONResponse(content, status_code=503 if saturated else 200)
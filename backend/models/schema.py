@@ -1,5 +1,5 @@
-from pydantic import BaseModel,constr
-from typing import Optional,Dict,Literal
+from pydantic import BaseModel,ConfigDict,Field,constr,field_validator,model_validator
+from typing import Optional,Dict,List,Literal
 
 class PosterRequest(BaseModel):
     # Step 1: User's prompt about the kind of poster
@@ -21,12 +21,121 @@ class PosterRequest(BaseModel):
     # Step 4: Optional — custom prompt override
     custom_prompt: Optional[str] = None
 
+    # Step 5: Optional — start rendering the poster in the background right away
+    speculate: bool = False
+
+class PosterFields(BaseModel):
+    # Poster content produced by LLaMA (or edited by the user), validated once at the edge
+    model_config = ConfigDict(extra="ignore")
+
+    custom_prompt: Optional[str] = None
+    hero_headline: Optional[str] = None
+    hero_subline: Optional[str] = None
+    description: Optional[str] = None
+    success_metrics: Optional[str] = None
+    testimonial: Optional[str] = None
+    target_audience: Optional[str] = None
+    cta: Optional[str] = None
+    cta_link: Optional[str] = None
+    suggested_theme: Optional[str] = None
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def coerce_to_text(cls, value):
+        # LLMs sometimes return stats as a list or numbers instead of a string
+        if isinstance(value, list):
+            return " | ".join(str(item) for item in value)
+        if value is not None and not isinstance(value, str):
+            return str(value)
+        return value
+
+PosterFieldName = Literal[
+    "custom_prompt", "hero_headline", "hero_subline", "description", "success_metrics",
+    "testimonial", "target_audience", "cta", "cta_link", "suggested_theme"
+]
+
+class RegenerateFieldsRequest(BaseModel):
+    # Current poster content; everything not listed in `regenerate` is kept as-is
+    fields: PosterFields
+    regenerate: List[PosterFieldName] = Field(min_length=1)
+
+    # Optional context for regenerating custom_prompt / suggested_theme
+    main_prompt: Optional[str] = None
+    theme: Optional[str] = None
+
 class PosterImageRequest(BaseModel):
-    fields:dict #This will include hero_headline,description,etc..
+    fields:PosterFields #This will include hero_headline,description,etc..
     theme:Optional[str] = None # Can be user input ot LLaMa's suggestgion
+    speculation_token:Optional[str] = None # From /generate-fields when speculate was on
+
+class PosterVariant(BaseModel):
+    # An extra poster next to the base one: another theme and/or rewritten fields.
+    # custom_prompt is always shared with the base poster.
+    theme: Optional[str] = None
+    regenerate: List[PosterFieldName] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def require_change(self):
+        # An empty variant would just re-render the base poster at full cost; custom_prompt is
+        # shared with the base poster and never regenerated, so it doesn't count as a change
+        if not self.theme and not any(name != "custom_prompt" for name in self.regenerate):
+            raise ValueError("A variant needs a theme or at least one field other than custom_prompt to regenerate")
+        return self
+
+class CombinedPosterRequest(PosterRequest):
+    # Fields + poster image in one request, plus up to 4 variants rendered concurrently
+    variants: List[PosterVariant] = Field(default_factory=list, max_length=4)
 
 class TextToImageRequest(BaseModel):
     main_prompt: str
     aspect_ratio: Literal["1:1", "16:9", "3:2", "2:3", "3:4", "4:3", "9:16"] = "1:1"
-    count: int = 1
+    count: int = Field(1, ge=1)  # Charged against the image quota, so never zero or negative
+
+AspectRatio = Literal["1:1", "16:9", "3:2", "2:3", "3:4", "4:3", "9:16"]
+
+class MultiFormatImageRequest(BaseModel):
+    # One generation, reframed locally into every requested aspect ratio
+    main_prompt: str
+    aspect_ratios: List[AspectRatio] = Field(default=["1:1", "16:9", "9:16"], min_length=1)
+
+class ProgressiveImageRequest(TextToImageRequest):
+    # Send a fast low-res preview event before the final images
+    preview: bool = True
+
+
+# ---------- Responses ----------
+
+class PosterFieldsResponse(BaseModel):
+    status: Literal["success"] = "success"
+    data: Optional[PosterFields] = None
+    message: str
+    speculation_token: Optional[str] = None
+
+class PosterImageResponse(BaseModel):
+    status: Literal["success"] = "success"
+    image_base64: str
+    message: str
+
+class PosterVariantResponse(BaseModel):
+    status: Literal["success"] = "success"
+    index: int  # 0 is the base poster, 1..K follow the request's variants
+    fields: PosterFields
+    image_base64: str
+
+class GeneratedImagesResponse(BaseModel):
+    status: Literal["success"] = "success"
+    images: List[str]
+    message: str
+
+class MultiFormatImagesResponse(BaseModel):
+    status: Literal["success"] = "success"
+    renditions: Dict[str, str]  # aspect ratio -> base64 PNG
+    message: str
+
+class StatusResponse(BaseModel):
+    status: str
+    message: Optional[str] = None
 
+class HealthResponse(BaseModel):
+    status: Literal["healthy", "saturated"]
+    admission: Dict[str, dict]
@@ -0,0 +1,175 @@
+import asyncio
+import math
+import os
+import time
+import weakref
+from collections import deque
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Multiplicative decrease applied when a request is slow or fails
+BACKOFF_RATIO = 0.9
+
+# Weight of the newest sample in the latency moving average
+LATENCY_SMOOTHING = 0.2
+
+# /readyz reports not-ready once the wait queue is this full
+READINESS_QUEUE_FRACTION = float(os.getenv("ADMISSION_READINESS_QUEUE_FRACTION", "0.5"))
+
+
+def _limits(prefix: str, initial: int, min_limit: int, max_limit: int, max_queue: int, target: float, queue_timeout: float) -> dict:
+    return {
+        "initial": int(os.getenv(f"ADMISSION_{prefix}_INITIAL", str(initial))),
+        "min_limit": int(os.getenv(f"ADMISSION_{prefix}_MIN", str(min_limit))),
+        "max_limit": int(os.getenv(f"ADMISSION_{prefix}_MAX", str(max_limit))),
+        "max_queue": int(os.getenv(f"ADMISSION_{prefix}_QUEUE", str(max_queue))),
+        "target_latency": float(os.getenv(f"ADMISSION_{prefix}_TARGET_SECONDS", str(target))),
+        "queue_timeout": float(os.getenv(f"ADMISSION_{prefix}_QUEUE_TIMEOUT", str(queue_timeout))),
+    }
+
+
+# 🚦 Per endpoint class: LLM-only requests are short, image requests hold big buffers for longer
+ENDPOINT_CLASSES = {
+    "llm": _limits("LLM", initial=16, min_limit=2, max_limit=64, max_queue=32, target=15, queue_timeout=10),
+    "image": _limits("IMAGE", initial=8, min_limit=1, max_limit=32, max_queue=16, target=45, queue_timeout=20),
+}
+
+
+class Overloaded(Exception):
+    """Raised when a request can't be admitted; carries a Retry-After hint in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit with a bounded FIFO wait queue, adjusted AIMD-style:
+    every request that finishes under the target latency grows the limit by 1/limit
+    (about +1 per full window), every slow or failed one shrinks it by BACKOFF_RATIO.
+    """
+
+    def __init__(self, name: str, initial: int, min_limit: int, max_limit: int,
+                 max_queue: int, target_latency: float, queue_timeout: float):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.target_latency = target_latency
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self.avg_latency = target_latency / 2
+        self._waiters = deque()
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    def retry_after(self) -> int:
+        """Rough time for the current backlog to drain."""
+        backlog = self.in_flight + self.queued
+        return max(1, math.ceil(self.avg_latency * backlog / max(self.limit, 1)))
+
+    async def acquire(self):
+        if self.in_flight < int(self.limit) and not self.queued:
+            self.in_flight += 1
+            return
+
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return
+            waiter.cancel()
+            self.rejected += 1
+            raise Overloaded(self.retry_after())
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot we will never use
+                self.abandon()
+            else:
+                waiter.cancel()
+            raise
+
+    def try_acquire(self) -> bool:
+        """Takes a slot only if one is free right now; never queues (for optional background work)."""
+        if self.in_flight < int(self.limit) and not self.queued:
+            self.in_flight += 1
+            return True
+        return False
+
+    def release(self, latency: float, success: bool):
+        self.in_flight -= 1
+        self.avg_latency += LATENCY_SMOOTHING * (latency - self.avg_latency)
+
+        if success and latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        else:
+            self.limit = max(self.min_limit, self.limit * BACKOFF_RATIO)
+
+        self._wake_waiters()
+
+    def abandon(self):
+        """Gives a slot back without a latency sample, so the limit is left alone."""
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self):
+        # Hand freed capacity to waiters in arrival order
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if waiter.done():
+                continue
+            self.in_flight += 1
+            waiter.set_result(None)
+
+    @property
+    def saturated(self) -> bool:
+        return self.queued >= max(1, self.max_queue * READINESS_QUEUE_FRACTION)
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "avg_latency_s": round(self.avg_latency, 2),
+            "rejected": self.rejected,
+            "saturated": self.saturated
+        }
+
+
+class AdmissionTicket:
+    """
+    One admitted request's slot, for responses that outlive the handler (SSE streams).
+
+    release() is idempotent. If the ticket is garbage collected unreleased - the client left
+    before the stream generator ever started - the slot is abandoned without touching the limit.
+    """
+
+    def __init__(self, limiter: AdaptiveLimiter):
+        self.limiter = limiter
+        self.start = time.perf_counter()
+        self.success = True
+        self._finalizer = weakref.finalize(self, limiter.abandon)
+
+    def release(self):
+        if self._finalizer.detach() is not None:
+            self.limiter.release(time.perf_counter() - self.start, self.success)
+
+    def abandon(self):
+        """Gives the slot back unused (work cancelled), leaving the limit alone."""
+        self._finalizer()
+
+
+limiters = {name: AdaptiveLimiter(name, **config) for name, config in ENDPOINT_CLASSES.items()}
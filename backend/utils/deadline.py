@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ⏱️ Clients may shorten their budget with this header (milliseconds)
+DEADLINE_HEADER = "x-request-deadline-ms"
+
+# Default end-to-end budget per endpoint, in seconds
+DEFAULT_DEADLINES = {
+    "/generate-fields": float(os.getenv("DEADLINE_GENERATE_FIELDS", "45")),
+    "/regenerate-fields": float(os.getenv("DEADLINE_REGENERATE_FIELDS", "30")),
+    "/generate-poster": float(os.getenv("DEADLINE_GENERATE_POSTER", "120")),
+    "/generate-images": float(os.getenv("DEADLINE_GENERATE_IMAGES", "150")),
+    # Same generation as /generate-images plus a preview / local reframing on top
+    "/generate-images/stream": float(os.getenv("DEADLINE_GENERATE_IMAGES_STREAM", "165")),
+    "/generate-images/multi-format": float(os.getenv("DEADLINE_GENERATE_IMAGES_MULTI_FORMAT", "180")),
+    "/posters": float(os.getenv("DEADLINE_POSTERS", "180")),
+}
+FALLBACK_DEADLINE = float(os.getenv("DEADLINE_DEFAULT", "120"))
+
+# A header can never ask for more than this
+MAX_DEADLINE = float(os.getenv("DEADLINE_MAX", "300"))
+
+# How often to check whether the client went away
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a stage cannot start or finish within the request's remaining budget."""
+
+
+class RequestCancelled(DeadlineExceeded):
+    """Raised when the client disconnected and further work would be wasted."""
+
+
+class Deadline:
+    """
+    Absolute end time for one request, shared by every pipeline stage.
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self.cancelled = False
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self, stage: str):
+        if self.cancelled:
+            raise RequestCancelled(f"Client disconnected before {stage}")
+        if self.remaining() <= 0:
+            raise DeadlineExceeded(f"Request deadline of {self.budget:.0f}s exceeded before {stage}")
+
+    def allows(self, seconds: float) -> bool:
+        """Whether a stage that typically takes `seconds` can still finish in time."""
+        return not self.cancelled and self.remaining() >= seconds
+
+
+_current_deadline: ContextVar = ContextVar("request_deadline", default=None)
+
+
+def current_deadline():
+    return _current_deadline.get()
+
+
+def set_current_deadline(deadline: Deadline):
+    return _current_deadline.set(deadline)
+
+
+def reset_current_deadline(token):
+    _current_deadline.reset(token)
+
+
+def stage_timeout(stage: str, cap: float) -> float:
+    """
+    Timeout for one upstream call: the stage's own cap, shortened to the request's remaining budget.
+    Raises DeadlineExceeded/RequestCancelled if there is nothing left to spend.
+
+    Args:
+        stage (str): Name used in the error message.
+        cap (float): Longest this stage should ever wait, in seconds.
+
+    Returns:
+        float: Seconds to pass as the call's timeout.
+    """
+    deadline = current_deadline()
+    if deadline is None:
+        return cap
+    deadline.check(stage)
+    return min(cap, deadline.remaining())
+
+
+def deadline_allows(seconds: float) -> bool:
+    deadline = current_deadline()
+    return deadline is None or deadline.allows(seconds)
+
+
+def check_deadline(stage: str):
+    deadline = current_deadline()
+    if deadline is not None:
+        deadline.check(stage)
+
+
+def deadline_for(path: str, header_value: str = None) -> Deadline:
+    """
+    Builds the request's deadline from the X-Request-Deadline-Ms header or the endpoint default.
+    """
+    budget = DEFAULT_DEADLINES.get(path, FALLBACK_DEADLINE)
+    if header_value:
+        try:
+            budget = min(float(header_value) / 1000, MAX_DEADLINE)
+        except ValueError:
+            pass
+    return Deadline(budget)
+
+
+async def watch_disconnect(request, deadline: Deadline):
+    """Cancels the deadline as soon as the client disconnects."""
+    while not deadline.cancelled:
+        if await request.is_disconnected():
+            logger.info("🔌 [deadline] Client disconnected from %s, cancelling remaining work", request.url.path)
+            deadline.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
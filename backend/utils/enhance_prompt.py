@@ -1,20 +1,95 @@
 from openai import OpenAI
 import json
+import logging
 import os
 from dotenv import load_dotenv
+from backend.utils.plan_validator import MODEL_CAPABILITIES, validate_plan
+from backend.utils.replay import chat_completion
+from backend.utils.deadline import DeadlineExceeded, deadline_allows, stage_timeout
+from backend.utils.intent_classifier import (
+    FAST_INTENT_ENABLED, FAST_INTENT_THRESHOLD, agreement_tracker, build_local_plan,
+    classify_intent, remember_intent,
+)
 
 # Load the environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Get your Groq API key from .env files
 API_KEY = os.getenv("GROQ_API_KEY")
 
-# Initialize OpenAI Client
+# Longest we ever wait on Kimi (shortened further by the request deadline)
+LLM_TIMEOUT = 60
+
+# Don't start a replacement-prompt call with less than this left
+MIN_LLM_SECONDS = 5
+
+# Initialize OpenAI Client. No SDK retries: each attempt would get the full remaining budget
 client = OpenAI(
     base_url="https://api.groq.com/openai/v1",
-    api_key=API_KEY
+    api_key=API_KEY,
+    max_retries=0
 )
 
+def template_prompt(user_prompt: str, aspect_ratio: str) -> str:
+    """Generic prompt used when no LLM-written prompt is available for a model."""
+    return f"A detailed, high-quality image of {user_prompt}, {aspect_ratio} format, professional photography style, sharp focus, excellent lighting"
+
+def request_tier_prompts(user_prompt: str, aspect_ratio: str, models: list) -> dict:
+    """
+    Asks Kimi K2 for prompts for only the given models (used to fill replacement tiers).
+
+    Args:
+        user_prompt (str): The base description of the image provided by the user.
+        aspect_ratio (str): The desired aspect ratio.
+        models (list): Model names that still need a prompt.
+
+    Returns:
+        dict: Model name -> enhanced prompt.
+    """
+    model_lines = "\n".join(
+        '- "{}" (max {} tokens)'.format(model, MODEL_CAPABILITIES[model]["max_tokens"]) for model in models
+    )
+    request = f"""
+Write one optimized image generation prompt per model for this request.
+
+- user_prompt: "{user_prompt}"
+- aspect_ratio: "{aspect_ratio}"
+
+Models:
+{model_lines}
+
+Keep each prompt within its model's token limit. Return ONLY a JSON object mapping each model name to its prompt.
+"""
+    content = chat_completion(
+        client,
+        model="moonshotai/kimi-k2-instruct",
+        messages=[{"role": "user", "content": request}],
+        max_tokens=min(2000, sum(MODEL_CAPABILITIES[m]["max_tokens"] for m in models)),
+        temperature=0.7,
+        timeout=stage_timeout("replacement prompts", LLM_TIMEOUT)
+    )
+    prompts = json.loads(content)
+    return {model: prompts[model] for model in models if isinstance(prompts.get(model), str)}
+
+def fill_pending_prompts(plan: dict, pending: list, user_prompt: str, aspect_ratio: str, use_llm: bool = True):
+    """
+    Writes prompts into the replacement tiers returned by validate_plan.
+    Only the replacement models are sent to Kimi; anything it can't provide gets a template prompt.
+    """
+    models = [plan[tier_key]["name"] for tier_key in pending]
+    prompts = {}
+    if use_llm and deadline_allows(MIN_LLM_SECONDS):
+        try:
+            prompts = request_tier_prompts(user_prompt, aspect_ratio, models)
+        except Exception as e:
+            logger.warning("❌ Replacement prompt crafting error: %s", e)
+
+    for tier_key in pending:
+        model = plan[tier_key]["name"]
+        plan[tier_key]["enhanced_prompt"] = prompts.get(model) or template_prompt(user_prompt, aspect_ratio)
+
 def enhance_prompt(user_prompt: str, aspect_ratio: str):
     """
     Enhances the user prompt using Kimi K2 with smart multi-model selection.
@@ -27,6 +102,12 @@ def enhance_prompt(user_prompt: str, aspect_ratio: str):
     Returns:
         dict: A JSON-parsed dictionary containing enhanced prompts for multiple models.
     """
+    # ⚡ Fast path: confident local intent guess skips the Kimi routing call entirely
+    prediction = classify_intent(user_prompt)
+    if FAST_INTENT_ENABLED and prediction.confidence >= FAST_INTENT_THRESHOLD:
+        logger.info("⚡ Local intent %s (%.2f, %s), skipping Kimi", prediction.intent, prediction.confidence, prediction.source)
+        return build_local_plan(user_prompt, aspect_ratio, prediction.intent)
+
     # Updated prompt template with all 5 models, optimized for token limit utilization
     prompt_template = """
 You are Kimi K2, a world-class agentic prompt engineer specializing in optimal model selection for image generation quality.
@@ -163,7 +244,8 @@ Always provide 3 models in quality priority order:
 
     # Call Kimi K2 via Groq
     try:
-        completion = client.chat.completions.create(
+        result = chat_completion(
+            client,
             model="moonshotai/kimi-k2-instruct",
             messages=[
                 {
@@ -177,18 +259,26 @@ Always provide 3 models in quality priority order:
                 }
             ],
             max_tokens=2000,  # Increased for multi-model responses
-            temperature=0.7
+            temperature=0.7,
+            timeout=stage_timeout("prompt enhancement", LLM_TIMEOUT)
         )
-        result = completion.choices[0].message.content
         response = json.loads(result)  # Safely parse JSON
+
+        # Shadow-compare the local classifier with Kimi's choice for offline tuning
+        agreement_tracker.record(user_prompt, prediction, response.get("intent"))
+        remember_intent(user_prompt, response.get("intent"))
         
-        # Add aspect_ratio to response for backend use
-        response["aspect_ratio"] = aspect_ratio
+        # Validate the tiers against model capabilities (also sets aspect_ratio for backend use)
+        plan, pending = validate_plan(response, aspect_ratio)
+        if pending:
+            fill_pending_prompts(plan, pending, user_prompt, aspect_ratio)
         
-        return response
+        return plan
         
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print("❌ LLM prompt crafting error:", str(e))
+        logger.warning("❌ LLM prompt crafting error: %s", e)
         # Fallback: Smart default based on aspect ratio
         
         # If landscape/portrait, skip imagen models
@@ -202,7 +292,7 @@ Always provide 3 models in quality priority order:
             secondary_model = "imagen-3"
             tertiary_model = "qwen-image"
         
-        return {
+        fallback = {
             "intent": "unknown",
             "aspect_ratio": aspect_ratio,
             "primary_model": {
@@ -220,4 +310,9 @@ Always provide 3 models in quality priority order:
                 "enhanced_prompt": f"Image of {user_prompt}, {aspect_ratio} format",
                 "reasoning": "Final fallback option"
             }
-        }
\ No newline at end of file
+        }
+
+        # Ratios like 3:2 still need imagen swapped out, without another LLM call
+        plan, pending = validate_plan(fallback, aspect_ratio)
+        fill_pending_prompts(plan, pending, user_prompt, aspect_ratio, use_llm=False)
+        return plan
\ No newline at end of file
@@ -1,19 +1,24 @@
-import requests
-import base64
-import os
+import logging
+import time
 from dotenv import load_dotenv
+from backend.utils.image_backends import ImageBackendError, image_backend
+from backend.utils.deadline import DeadlineExceeded, check_deadline, deadline_allows
+from backend.utils.plan_validator import ASPECT_SIZES, MODEL_CAPABILITIES, TIERS, clip_to_token_limit, supports
 
 load_dotenv()
 
-# Load API key securely
-API_KEY = os.getenv("IMAGEGEN_API_KEY", "ddc-a4f-3085d84aef2847f5a150214d4fe4513d")
+logger = logging.getLogger(__name__)
 
-# Imagen API endpoint
-IMAGEN_API_URL = "https://api.a4f.co/v1/images/generations"
+# Fast, cheap model used for progressive previews
+PREVIEW_MODEL = "flux-schnell-v2"
 
-def generate_image(enhanced_data: dict, count: int = 1) -> list:
+# Poster renders are square and go through this fixed order
+POSTER_MODELS = ["qwen-image", "imagen-4", "imagen-3"]
+POSTER_SIZE = "1024x1024"
+
+def generate_image(enhanced_data: dict, count: int = 1, native_size: bool = False) -> list:
     """
-    Generates images using the Imagen API and returns them
+    Generates images through the configured image backend and returns them
     as a list of base64 strings. Supports up to 3 images per request.
     Uses a 3-tier fallback strategy: primary -> secondary -> tertiary models.
 
@@ -24,44 +29,22 @@ def generate_image(enhanced_data: dict, count: int = 1) -> list:
             - secondary_model: {name, enhanced_prompt}
             - tertiary_model: {name, enhanced_prompt}
         count (int): Number of images (capped at 3).
+        native_size (bool): Render at each model's largest native size instead of the
+            aspect ratio's size (used for masters that get reframed locally).
     """
 
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
-
     # Extract aspect_ratio
     aspect_ratio = enhanced_data.get("aspect_ratio", "1:1")
 
-    # Map aspect ratios to sizes
-    aspect_map = {
-        "1:1": "1024x1024",
-        "16:9": "1280x720",
-        "9:16": "720x1280",
-        "4:3": "1024x768",
-        "3:4": "768x1024",
-        "3:2": "1024x683",
-        "2:3": "683x1024"
-    }
-
-    # Model configs with provider prefixes
-    model_configs = {
-        "imagen-4": {"api_model": "provider-4/imagen-4", "default_size": "1024x1024"},
-        "imagen-3": {"api_model": "provider-4/imagen-3", "default_size": "1024x1024"},
-        "qwen-image": {"api_model": "provider-5/qwen-image", "default_size": "1024x1024"},
-        "flux-schnell-v2": {"api_model": "provider-7/flux-schnell-v2", "default_size": "1024x1024"},
-        "sana-1.5": {"api_model": "provider-6/sana-1.5", "default_size": "4096x4096"}
-    }
-
     count = min(count, 3)  # cap at 3
 
-    # Define tiers
-    tiers = ["primary_model", "secondary_model", "tertiary_model"]
+    # Tiers normally arrive already validated by enhance_prompt; the checks below are a safety net
+    tried = set()
+    skipped_for_deadline = []
 
-    for tier_key in tiers:
+    for tier_key in TIERS:
         if tier_key not in enhanced_data:
-            print(f"⚠️ {tier_key} not found in enhanced_data, skipping.")
+            logger.info("⚠️ %s not found in enhanced_data, skipping.", tier_key)
             continue
 
         tier = enhanced_data[tier_key]
@@ -69,52 +52,110 @@ def generate_image(enhanced_data: dict, count: int = 1) -> list:
         prompt = tier.get("enhanced_prompt")
 
         if not model or not prompt:
-            print(f"⚠️ Missing model or prompt in {tier_key}, skipping.")
+            logger.warning("⚠️ Missing model or prompt in %s, skipping.", tier_key)
             continue
 
-        print(f"🧪 Trying {tier_key} ({model})...")
+        logger.info("🧪 Trying %s (%s)...", tier_key, model)
+
+        # Skip if the backend can't serve this model
+        if not image_backend.supports_model(model):
+            logger.warning("⚠️ Model %s not supported, skipping.", model)
+            continue
 
-        # Skip if model not supported in configs
-        if model not in model_configs:
-            print(f"⚠️ Model {model} not supported, skipping.")
+        # Check aspect ratio compatibility
+        if not supports(model, aspect_ratio):
+            logger.warning("⚠️ %s does not support %s, skipping.", model, aspect_ratio)
             continue
 
-        # Check aspect ratio compatibility for imagen models
-        if model in ["imagen-4", "imagen-3"] and aspect_ratio in ["16:9", "9:16"]:
-            print(f"⚠️ {model} does not support {aspect_ratio}, skipping.")
+        # Don't pay twice for a model that already failed
+        if model in tried:
+            logger.info("⚠️ %s already tried, skipping.", model)
             continue
+        tried.add(model)
 
-        config = model_configs[model]
-        size = aspect_map.get(aspect_ratio, config["default_size"])
+        # Skip tiers that can't finish inside the request's remaining budget
+        if not deadline_allows(MODEL_CAPABILITIES[model]["typical_seconds"]):
+            logger.warning("⏱️ Not enough time left for %s, skipping.", model)
+            skipped_for_deadline.append(model)
+            continue
 
-        data = {
-            "model": config["api_model"],
-            "prompt": prompt,
-            "n": count,
-            "size": size
-        }
+        if native_size:
+            size = MODEL_CAPABILITIES[model]["default_size"]
+        else:
+            size = ASPECT_SIZES.get(aspect_ratio, MODEL_CAPABILITIES[model]["default_size"])
 
         try:
-            # Call the Imagen API
-            response = requests.post(IMAGEN_API_URL, headers=headers, json=data)
-            response.raise_for_status()
-
-            # Extract image URLs
-            image_urls = [item['url'] for item in response.json()['data']]
-            print(f"✅ Image URLs for {model}:", image_urls)
-
-            # Download and convert to base64
-            images = []
-            for url in image_urls:
-                image_response = requests.get(url)
-                image_response.raise_for_status()
-                base64_string = base64.b64encode(image_response.content).decode('utf-8')
-                images.append(base64_string)
-
-            return images
-
-        except requests.RequestException as e:
-            print(f"❌ Error during image generation for {model}:", str(e))
+            return image_backend.generate(model, prompt, count, size)
+
+        except ImageBackendError as e:
+            logger.warning("❌ Error during image generation for %s: %s", model, e)
             continue
 
-    raise RuntimeError("All model tiers failed to generate images.")
\ No newline at end of file
+    check_deadline("the next model tier")
+    if skipped_for_deadline:
+        raise DeadlineExceeded(f"Not enough time left for {', '.join(skipped_for_deadline)}")
+    raise RuntimeError("All model tiers failed to generate images.")
+
+def generate_preview_image(enhanced_data: dict) -> str:
+    """
+    Generates a single low-resolution preview with the fast model, to show while the final render runs.
+
+    Args:
+        enhanced_data (dict): The full JSON from enhance_prompt.
+
+    Returns:
+        str: Base64-encoded preview image.
+    """
+    aspect_ratio = enhanced_data.get("aspect_ratio", "1:1")
+
+    # Prefer the prompt Kimi wrote for the preview model, else reuse the primary one
+    tiers = [enhanced_data.get(tier_key) or {} for tier_key in TIERS]
+    prompt = next((t.get("enhanced_prompt") for t in tiers if t.get("name") == PREVIEW_MODEL and t.get("enhanced_prompt")), None)
+    prompt = prompt or next((t.get("enhanced_prompt") for t in tiers if t.get("enhanced_prompt")), None)
+    if not prompt:
+        raise ValueError("No prompt available for preview")
+
+    # Half resolution in each dimension is plenty for a placeholder
+    width, height = ASPECT_SIZES.get(aspect_ratio, "1024x1024").split("x")
+    size = f"{int(width) // 2}x{int(height) // 2}"
+
+    logger.info("👀 Generating %s preview with %s...", size, PREVIEW_MODEL)
+    return image_backend.generate(PREVIEW_MODEL, clip_to_token_limit(prompt, PREVIEW_MODEL), 1, size)[0]
+
+def generate_poster_image(prompt: str) -> str:
+    """
+    Renders a square poster with fallback models and returns it as a base64 string.
+
+    Args:
+        prompt (str): The full image generation prompt.
+
+    Returns:
+        str: Base64-encoded image suitable for frontend rendering.
+    """
+    last_error = None
+
+    # Try each model in sequence
+    for i, model in enumerate(POSTER_MODELS):
+        logger.info("🔄 Trying model %d/%d: %s", i + 1, len(POSTER_MODELS), model)
+
+        try:
+            base64_string = image_backend.generate(model, prompt, 1, POSTER_SIZE)[0]
+            logger.info("✅ Successfully generated image using %s", model)
+            return base64_string
+
+        except ImageBackendError as e:
+            last_error = e
+            logger.warning("❌ Model %s failed: %s", model, e)
+
+            # If not the last model, wait a bit before trying next one (unless the deadline is nearly up)
+            if i < len(POSTER_MODELS) - 1 and deadline_allows(1):
+                logger.debug("⏳ Waiting 1 second before trying next model...")
+                time.sleep(1)
+            continue
+
+    # If we ran out of time, say so rather than blaming the models
+    check_deadline("the next model")
+
+    # If all models failed, raise the last error
+    logger.error("❌ All models failed!")
+    raise RuntimeError(f"All image generation models failed. Last error: {str(last_error)}") from last_error
@@ -0,0 +1,213 @@
+import abc
+import base64
+import contextvars
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import requests
+from PIL import Image, ImageDraw
+from dotenv import load_dotenv
+from backend.utils.replay import http_get, http_post
+from backend.utils.deadline import check_deadline, stage_timeout
+from backend.utils.plan_validator import ASPECT_SIZES, MODEL_CAPABILITIES
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 🔌 Which engine renders images: "a4f" (hosted API) or "stub" (local, synthetic, no network)
+IMAGE_BACKEND = os.getenv("IMAGE_BACKEND", "a4f").lower()
+
+# Load API key securely
+A4F_API_KEY = os.getenv("IMAGEGEN_API_KEY", "ddc-a4f-3085d84aef2847f5a150214d4fe4513d")
+
+# Imagen API endpoint
+A4F_API_URL = "https://api.a4f.co/v1/images/generations"
+
+# Longest single generation / download we ever wait for (shortened further by the request deadline)
+GENERATION_TIMEOUT = 120
+DOWNLOAD_TIMEOUT = 60
+
+# Provider ids and batching limits on a4f
+A4F_MODELS = {
+    "imagen-4": {"api_model": "provider-4/imagen-4", "max_n": 4, "native_batching": True},
+    "imagen-3": {"api_model": "provider-4/imagen-3", "max_n": 4, "native_batching": True},
+    "qwen-image": {"api_model": "provider-5/qwen-image", "max_n": 4, "native_batching": True},
+    "flux-schnell-v2": {"api_model": "provider-7/flux-schnell-v2", "max_n": 4, "native_batching": True},
+    "sana-1.5": {"api_model": "provider-6/sana-1.5", "max_n": 4, "native_batching": True},
+}
+
+# Stub engine: each call sleeps this fraction of the model's typical_seconds (0 = instant)
+STUB_LATENCY_SCALE = float(os.getenv("IMAGE_STUB_LATENCY_SCALE", "0"))
+
+# Stub engine: fixed extra seconds per call (on top of the scaled latency)
+STUB_LATENCY = float(os.getenv("IMAGE_STUB_LATENCY_MS", "0")) / 1000
+
+# Parallel upstream calls/downloads for one request (chunked batches, multi-image downloads)
+FAN_OUT_WORKERS = int(os.getenv("IMAGE_FAN_OUT_WORKERS", "8"))
+
+_FAN_OUT_PREFIX = "image-fan-out"
+_fan_out_pool = ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix=_FAN_OUT_PREFIX)
+
+
+class ImageBackendError(Exception):
+    """Raised when a backend could not produce images for a model; callers move on to the next tier."""
+
+
+def fan_out(fn, items: list) -> list:
+    """
+    Runs fn over items on the shared pool, keeping order and the caller's context (deadline, request id).
+    A single item, or a call from inside the pool (which could deadlock it), runs inline.
+    """
+    if len(items) <= 1 or threading.current_thread().name.startswith(_FAN_OUT_PREFIX):
+        return [fn(item) for item in items]
+    futures = [_fan_out_pool.submit(contextvars.copy_context().run, fn, item) for item in items]
+    return [future.result() for future in futures]
+
+
+class ImageBackend(abc.ABC):
+    """
+    Renders images for the models in MODEL_CAPABILITIES.
+
+    Subclasses declare their per-model batching limits in `models` and implement _render;
+    generate() splits a request into batches the backend can take and runs them concurrently.
+    """
+
+    name = "base"
+    models: dict = {}
+
+    def supports_model(self, model: str) -> bool:
+        return model in self.models and model in MODEL_CAPABILITIES
+
+    def capabilities(self, model: str) -> dict:
+        """
+        Everything known about a model on this backend.
+
+        Returns:
+            dict: aspect_ratios, sizes, max_tokens, default_size, typical_seconds, max_n, native_batching.
+        """
+        caps = MODEL_CAPABILITIES[model]
+        sizes = {ASPECT_SIZES[ratio] for ratio in caps["aspect_ratios"]} | {caps["default_size"]}
+        return {
+            **caps,
+            "sizes": sorted(sizes),
+            "max_n": self.models[model]["max_n"],
+            "native_batching": self.models[model]["native_batching"],
+        }
+
+    def generate(self, model: str, prompt: str, count: int, size: str) -> list:
+        """
+        Renders `count` images with one model.
+
+        Args:
+            model (str): A MODEL_CAPABILITIES key.
+            prompt (str): Prompt, already clipped to the model's token limit.
+            count (int): Number of images.
+            size (str): "WIDTHxHEIGHT".
+
+        Returns:
+            list: Base64-encoded images.
+
+        Raises:
+            ImageBackendError: The backend failed for this model.
+        """
+        if not self.supports_model(model):
+            raise ImageBackendError(f"{model} is not available on the {self.name} backend")
+
+        caps = self.capabilities(model)
+        batch = caps["max_n"] if caps["native_batching"] else 1
+        batches = [min(batch, count - start) for start in range(0, count, batch)]
+        results = fan_out(lambda n: self._render(model, prompt, n, size), batches)
+        return [image for images in results for image in images]
+
+    @abc.abstractmethod
+    def _render(self, model: str, prompt: str, n: int, size: str) -> list:
+        """Renders one batch of at most max_n images; raises ImageBackendError on failure."""
+
+
+class A4FBackend(ImageBackend):
+    """The hosted a4f.co images API (OpenAI-compatible): generate, then download each URL."""
+
+    name = "a4f"
+    models = A4F_MODELS
+
+    def _render(self, model: str, prompt: str, n: int, size: str) -> list:
+        headers = {
+            "Authorization": f"Bearer {A4F_API_KEY}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "model": self.models[model]["api_model"],
+            "prompt": prompt,
+            "n": n,
+            "size": size
+        }
+
+        try:
+            response = http_post(A4F_API_URL, headers=headers, json=data,
+                                 timeout=stage_timeout(f"{model} generation", GENERATION_TIMEOUT))
+            response.raise_for_status()
+
+            image_urls = [item['url'] for item in response.json()['data']]
+            logger.debug("✅ Image URLs for %s: %s", model, image_urls)
+
+            return fan_out(self._download, image_urls)
+
+        except (requests.RequestException, KeyError, ValueError) as e:
+            raise ImageBackendError(f"{model} failed on a4f: {e}") from e
+
+    @staticmethod
+    def _download(url: str) -> str:
+        image_response = http_get(url, timeout=stage_timeout("image download", DOWNLOAD_TIMEOUT))
+        image_response.raise_for_status()
+        return base64.b64encode(image_response.content).decode('utf-8')
+
+
+@lru_cache(maxsize=128)
+def _stub_png(seed: str, size: str) -> str:
+    width, height = (int(v) for v in size.split("x"))
+    digest = hashlib.sha256(seed.encode("utf-8")).digest()
+    image = Image.new("RGB", (width, height), tuple(digest[:3]))
+    # A few seeded shapes so reframing/saliency has something to work with
+    draw = ImageDraw.Draw(image)
+    for i in range(3):
+        x, y = digest[3 + i] / 255 * width, digest[6 + i] / 255 * height
+        radius = (digest[9 + i] / 255 * 0.2 + 0.05) * min(width, height)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=tuple(digest[12 + 3 * i:15 + 3 * i]))
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+class StubBackend(ImageBackend):
+    """
+    Local CPU engine for load tests and CI: deterministic synthetic PNGs (same model, prompt,
+    size and index give the same image) after a configurable, deadline-aware delay.
+    """
+
+    name = "stub"
+    models = {model: {"max_n": 10, "native_batching": True} for model in MODEL_CAPABILITIES}
+
+    def _render(self, model: str, prompt: str, n: int, size: str) -> list:
+        delay = STUB_LATENCY + STUB_LATENCY_SCALE * MODEL_CAPABILITIES[model]["typical_seconds"]
+        if delay > 0:
+            # Sleep no longer than the request has left, then fail the way a timed-out call would
+            time.sleep(stage_timeout(f"{model} generation", delay))
+            check_deadline(f"{model} download")
+        return [_stub_png(f"{model}|{prompt}|{index}", size) for index in range(n)]
+
+
+_BACKENDS = {
+    "a4f": A4FBackend,
+    "stub": StubBackend,
+}
+
+if IMAGE_BACKEND not in _BACKENDS:
+    raise ValueError(f"Unknown IMAGE_BACKEND {IMAGE_BACKEND!r}, expected one of {', '.join(_BACKENDS)}")
+
+image_backend: ImageBackend = _BACKENDS[IMAGE_BACKEND]()
@@ -0,0 +1,248 @@
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dotenv import load_dotenv
+from backend.utils.plan_validator import TIERS, clip_to_token_limit, tier_hierarchy
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ⚡ Skip the Kimi routing call when the local classifier is confident enough
+FAST_INTENT_ENABLED = os.getenv("FAST_INTENT_ENABLED", "false").lower() == "true"
+FAST_INTENT_THRESHOLD = float(os.getenv("FAST_INTENT_THRESHOLD", "0.8"))
+
+# JSON lines of (prompt, local guess, Kimi's choice) for offline tuning, e.g. logs/intent_agreement.jsonl.
+# Off by default: it stores raw user prompts.
+INTENT_AGREEMENT_LOG = os.getenv("INTENT_AGREEMENT_LOG", "")
+
+# Kimi's intent for recently seen prompts, so repeats are classified with full confidence
+INTENT_MEMO_SIZE = int(os.getenv("INTENT_MEMO_SIZE", "2048"))
+
+# Keyword weights per intent (same five intents as the enhance_prompt template).
+# Animals sit under "people" because they share the imagen-first hierarchy.
+INTENT_KEYWORDS = {
+    "people": {
+        "person": 1.0, "people": 1.0, "man": 1.0, "woman": 1.0, "men": 1.0, "women": 1.0,
+        "girl": 1.0, "boy": 1.0, "child": 1.0, "children": 1.0, "kid": 1.0, "kids": 1.0,
+        "baby": 1.0, "portrait": 1.5, "face": 1.2, "selfie": 1.5, "headshot": 1.5,
+        "family": 1.0, "couple": 1.0, "crowd": 0.8, "character": 0.8, "doctor": 0.8,
+        "student": 0.8, "students": 0.8, "athlete": 0.8, "dancer": 0.8, "chef": 0.8,
+        "smiling": 0.8, "elderly": 0.8, "warrior": 0.6, "dog": 0.7, "cat": 0.7,
+        "puppy": 0.7, "kitten": 0.7, "horse": 0.7, "bird": 0.6, "animal": 0.7, "animals": 0.7,
+    },
+    "text-design": {
+        "poster": 1.5, "flyer": 1.5, "banner": 1.5, "logo": 1.5, "typography": 1.5,
+        "text": 1.0, "headline": 1.2, "title": 0.8, "label": 0.8, "menu": 1.0,
+        "infographic": 1.5, "brochure": 1.5, "advertisement": 1.2, "ad": 0.8,
+        "marketing": 1.0, "ui": 1.2, "mockup": 1.2, "website": 1.0, "app": 0.6,
+        "invitation": 1.2, "thumbnail": 1.0, "signage": 1.2, "packaging": 1.0,
+        "business card": 1.5, "that says": 1.5, "with the words": 1.5, "slogan": 1.2,
+    },
+    "nature": {
+        "landscape": 1.5, "mountain": 1.2, "mountains": 1.2, "forest": 1.2, "ocean": 1.0,
+        "sea": 0.8, "beach": 1.0, "river": 1.0, "lake": 1.0, "waterfall": 1.2,
+        "sunset": 0.8, "sunrise": 0.8, "desert": 1.0, "valley": 1.0, "meadow": 1.2,
+        "nature": 1.5, "scenery": 1.5, "aurora": 1.2, "canyon": 1.2, "jungle": 1.0,
+        "glacier": 1.2, "island": 0.8, "clouds": 0.6, "sky": 0.5, "snowy": 0.6,
+    },
+    "artistic": {
+        "painting": 1.2, "watercolor": 1.5, "oil painting": 1.5, "illustration": 1.2,
+        "anime": 1.5, "cartoon": 1.5, "abstract": 1.2, "surreal": 1.2, "fantasy": 1.0,
+        "concept art": 1.5, "digital art": 1.5, "stylized": 1.2, "pixel art": 1.5,
+        "low poly": 1.5, "vaporwave": 1.5, "cyberpunk": 1.0, "sketch": 1.2, "comic": 1.2,
+        "impressionist": 1.5, "psychedelic": 1.2, "3d render": 1.0, "artistic": 1.2,
+    },
+    "realistic": {
+        "photo": 1.0, "photograph": 1.2, "realistic": 1.2, "photorealistic": 1.5,
+        "product": 1.0, "architecture": 1.2, "building": 1.0, "interior": 1.2, "room": 0.8,
+        "car": 0.8, "food": 1.0, "street": 0.8, "city": 0.6, "still life": 1.5,
+        "kitchen": 0.8, "office": 0.8, "furniture": 1.0,
+    },
+}
+
+# Phrase templates per visual style, following the enhancement strategies in the Kimi template
+STYLE_TEMPLATES = {
+    "photo": (
+        "{prompt}. Professional photograph shot on a Sony α7R IV with a Sony FE 85mm f/1.4 GM lens, "
+        "f/2.8, ISO 200, 1/250s, 5600K white balance, soft golden hour light with gentle rim lighting, "
+        "natural skin tones, Kodak Portra 400 color grading, shallow depth of field, creamy bokeh, "
+        "sharp focus on the subject, 4K resolution, {aspect_ratio} composition."
+    ),
+    "design": (
+        "{prompt}. Clean modern graphic design with precise, fully legible typography and a clear visual "
+        "hierarchy, every word spelled exactly as written, balanced layout with generous white space, "
+        "consistent brand-style color palette, crisp vector-style elements, high resolution, print-ready, "
+        "{aspect_ratio} format."
+    ),
+    "artistic": (
+        "{prompt}. Stylized digital painting with concept art quality, dramatic lighting, vibrant colors, "
+        "dynamic composition with a unique perspective, expressive brushwork and strong visual impact, "
+        "{aspect_ratio} format."
+    ),
+    "nature": (
+        "{prompt}. Breathtaking landscape photography, detailed terrain and natural textures, atmospheric "
+        "depth with soft haze, warm directional sunlight, rich natural colors, wide dynamic range, "
+        "ultra high resolution, {aspect_ratio} format."
+    ),
+}
+
+INTENT_STYLES = {
+    "people": "photo",
+    "realistic": "photo",
+    "text-design": "design",
+    "artistic": "artistic",
+    "nature": "nature",
+}
+
+MODEL_STYLES = {
+    "imagen-4": "photo",
+    "imagen-3": "photo",
+    "flux-schnell-v2": "artistic",
+    "sana-1.5": "nature",
+}
+
+
+class IntentPrediction:
+    def __init__(self, intent: str, confidence: float, source: str):
+        self.intent = intent
+        self.confidence = confidence
+        self.source = source
+
+
+def _normalize(prompt: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", prompt.lower()))
+
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def classify_intent(user_prompt: str) -> IntentPrediction:
+    """
+    Keyword-weighted intent guess. Confidence is the winner's share of all evidence,
+    scaled down when there is little evidence at all (a single weak keyword never wins).
+
+    Args:
+        user_prompt (str): The raw user prompt.
+
+    Returns:
+        IntentPrediction: intent, confidence in [0, 1] and where the answer came from.
+    """
+    text = _normalize(user_prompt)
+
+    with _memo_lock:
+        if text in _memo:
+            _memo.move_to_end(text)
+            return IntentPrediction(_memo[text], 1.0, "memo")
+
+    padded = f" {text} "
+    scores = Counter()
+    for intent, keywords in INTENT_KEYWORDS.items():
+        for keyword, weight in keywords.items():
+            if f" {keyword} " in padded:
+                scores[intent] += weight
+
+    if not scores:
+        return IntentPrediction("realistic", 0.0, "keywords")
+
+    intent, top = scores.most_common(1)[0]
+    confidence = (top / sum(scores.values())) * (1 - math.exp(-top))
+    return IntentPrediction(intent, round(confidence, 3), "keywords")
+
+
+def build_local_plan(user_prompt: str, aspect_ratio: str, intent: str) -> dict:
+    """
+    Builds the same structure enhance_prompt returns, from templates instead of Kimi.
+    """
+    plan = {"intent": intent, "aspect_ratio": aspect_ratio}
+    for tier_key, model in zip(TIERS, tier_hierarchy(intent, aspect_ratio)):
+        style = MODEL_STYLES.get(model, INTENT_STYLES.get(intent, "design"))
+        prompt = STYLE_TEMPLATES[style].format(prompt=user_prompt.strip().rstrip("."), aspect_ratio=aspect_ratio)
+        plan[tier_key] = {
+            "name": model,
+            "enhanced_prompt": clip_to_token_limit(prompt, model),
+            "reasoning": f"Local fast-path: {intent} intent, {style} template"
+        }
+    return plan
+
+
+class AgreementTracker:
+    """
+    Counts how often the local guess matches Kimi's intent, overall and per confidence band.
+
+    Only keyword predictions are scored; memo hits replay Kimi's own earlier answer, so they
+    are counted separately and would otherwise inflate the top band.
+    """
+
+    def __init__(self, log_path: str = INTENT_AGREEMENT_LOG):
+        self.log_path = log_path
+        self.total = 0
+        self.agreed = 0
+        self.by_band = {}
+        self.memo = {"total": 0, "agreed": 0}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def record(self, user_prompt: str, prediction: IntentPrediction, kimi_intent: str):
+        agreed = prediction.intent == kimi_intent
+        with self._lock:
+            if prediction.source == "memo":
+                self.memo["total"] += 1
+                self.memo["agreed"] += agreed
+                return
+
+            band = f"{min(int(prediction.confidence * 10), 9) / 10:.1f}"
+            self.total += 1
+            self.agreed += agreed
+            stats = self.by_band.setdefault(band, {"total": 0, "agreed": 0})
+            stats["total"] += 1
+            stats["agreed"] += agreed
+
+        if self.log_path:
+            line = json.dumps({
+                "ts": time.time(),
+                "prompt": user_prompt,
+                "local_intent": prediction.intent,
+                "local_confidence": prediction.confidence,
+                "source": prediction.source,
+                "kimi_intent": kimi_intent
+            }, ensure_ascii=False) + "\n"
+            with self._log_lock:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+
+        logger.info("🎯 [intent] local=%s (%.2f) kimi=%s agreement=%d/%d",
+                    prediction.intent, prediction.confidence, kimi_intent, self.agreed, self.total)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "total": self.total,
+                "agreed": self.agreed,
+                "agreement_rate": round(self.agreed / self.total, 3) if self.total else None,
+                "by_confidence": {band: dict(stats) for band, stats in sorted(self.by_band.items())},
+                "memo_hits": dict(self.memo),
+                "threshold": FAST_INTENT_THRESHOLD,
+                "fast_path_enabled": FAST_INTENT_ENABLED
+            }
+
+
+agreement_tracker = AgreementTracker()
+
+
+def remember_intent(user_prompt: str, kimi_intent: str):
+    """Stores Kimi's answer so the same prompt takes the fast path next time."""
+    if kimi_intent not in INTENT_KEYWORDS:
+        return
+    with _memo_lock:
+        _memo[_normalize(user_prompt)] = kimi_intent
+        _memo.move_to_end(_normalize(user_prompt))
+        while len(_memo) > INTENT_MEMO_SIZE:
+            _memo.popitem(last=False)
@@ -1,3 +1,4 @@
+import logging
 import os
 from dotenv import load_dotenv
 import requests
@@ -6,6 +7,8 @@ import json
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 #Initalize OpenAI Client with Open Router
 client=OpenAI(
     base_url="https://openrouter.ai/api/v1",
@@ -93,7 +96,7 @@ def craft_layered_prompts(user_prompt: str,aspect_ratio:str,theme:str=None,field
         result=completion.choices[0].message.content
         return json.loads(result) #Safely parse the JSON
     except Exception as e:
-        print("LLM prompt crafting error:",str(e))
+        logger.warning("LLM prompt crafting error: %s", e)
         #Fallback: Default layer prompts with multiple support
         return {
             "enhanced_prompt": f"A vibrant {user_prompt} scene with dynamic details, formatted for {aspect_ratio}",
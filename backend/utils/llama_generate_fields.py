@@ -1,16 +1,40 @@
 from openai import OpenAI
+import logging
 import os
 from dotenv import load_dotenv
 import json
 import re
+from backend.utils.replay import chat_completion
+from backend.models.schema import PosterFields
+from backend.utils.deadline import stage_timeout
+from backend.utils.structured_logging import Payload
 
 load_dotenv()  # Ensure .env variables are loaded
 
+logger = logging.getLogger(__name__)
+
+# Longest we ever wait on a single Groq call (shortened further by the request deadline)
+LLM_TIMEOUT = 60
+
+# Per-field limits, sent one line per field when only some fields are regenerated
+FIELD_CONSTRAINTS = {
+    "custom_prompt": "vivid, action-driven scene description (1-2 sentences)",
+    "hero_headline": "max 12 tokens",
+    "hero_subline": "max 15 tokens",
+    "description": "max 25 tokens",
+    "testimonial": "max 25 tokens (short single-quote quote)",
+    "success_metrics": "max 20 tokens (pipe-separated stats)",
+    "target_audience": "max 15 tokens",
+    "cta": "very short and clean",
+    "cta_link": "very short and clean URL",
+    "suggested_theme": "layout-aware background description with mood, colors and lighting (1-2 sentences)",
+}
+
 def clean_and_parse_json(raw_response):
     """
     Bulletproof JSON cleaner that handles all the weird stuff AI models throw at us
     """
-    print(f"🧠 [generate-fields] Raw response from LLaMA:\n{raw_response}")
+    logger.debug("🧠 [generate-fields] Raw response from LLaMA: %s", Payload(raw_response))
     
     try:
         # Step 1: Remove markdown code blocks (```json, ```, etc.)
@@ -37,25 +61,24 @@ def clean_and_parse_json(raw_response):
         
         # Step 5: Try to parse
         parsed_json = json.loads(cleaned)
-        print(f"✅ [generate-fields] Successfully parsed JSON")
+        logger.debug("✅ [generate-fields] Successfully parsed JSON")
         return parsed_json
         
     except json.JSONDecodeError as e:
-        print(f"❌ [generate-fields] JSON parsing error: {e}")
-        print(f"🔍 Cleaned response: {cleaned[:500]}...")
+        logger.warning("❌ [generate-fields] JSON parsing error: %s; cleaned response: %s", e, Payload(cleaned))
         
         # Last resort: try to extract JSON fields manually
         return extract_json_fields_manually(raw_response)
     
     except Exception as e:
-        print(f"❌ [generate-fields] Unexpected error: {e}")
+        logger.warning("❌ [generate-fields] Unexpected error: %s", e)
         return extract_json_fields_manually(raw_response)
 
 def extract_json_fields_manually(raw_response):
     """
     Manual extraction when JSON parsing completely fails
     """
-    print("🔧 [generate-fields] Attempting manual field extraction...")
+    logger.info("🔧 [generate-fields] Attempting manual field extraction...")
     
     result = {}
     
@@ -79,16 +102,17 @@ def extract_json_fields_manually(raw_response):
             result[field] = match.group(1).strip()
     
     if result:
-        print(f"✅ [generate-fields] Manual extraction found {len(result)} fields")
+        logger.info("✅ [generate-fields] Manual extraction found %d fields", len(result))
         return result
     else:
-        print("❌ [generate-fields] Manual extraction failed too")
+        logger.error("❌ [generate-fields] Manual extraction failed too")
         return None
 
 def call_llama_generate_fields(data):
     client = OpenAI(
         api_key=os.getenv("GROQ_API_KEY"),
-        base_url="https://api.groq.com/openai/v1"
+        base_url="https://api.groq.com/openai/v1",
+        max_retries=0  # Retries would each get the full remaining deadline
     )
 
     # 🛠️ Coerce all checkbox fields to boolean
@@ -178,18 +202,96 @@ FORMAT EXAMPLE:
 """
 
     # 🧠 Call LLaMA Model
-    response = client.chat.completions.create(
+    raw_response = chat_completion(
+        client,
         model="moonshotai/kimi-k2-instruct",
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": data.main_prompt}
         ],
-        temperature=0.7
+        temperature=0.7,
+        timeout=stage_timeout("generate-fields", LLM_TIMEOUT)
     )
-
-    raw_response = response.choices[0].message.content
     
     # 🧹 Clean and parse JSON with bulletproof method
     parsed_data = clean_and_parse_json(raw_response)
     
-    return parsed_data
\ No newline at end of file
+    return parsed_data
+
+def call_llama_regenerate_fields(fields: PosterFields, names: list, main_prompt: str = None, theme: str = None) -> PosterFields:
+    """
+    Regenerates only the requested fields and merges them into the existing ones.
+
+    Sends a minimal prompt (poster context + constraints for the requested fields only)
+    instead of the full generation prompt, so untouched fields are neither paid for nor lost.
+    Fields the model leaves out are asked for once more; if any are still missing the call fails
+    rather than quietly returning them unchanged.
+
+    Args:
+        fields (PosterFields): The poster's current fields.
+        names (list): Field names to regenerate (e.g. ["hero_headline"]).
+        main_prompt (str): Optional original user prompt, for extra context.
+        theme (str): Optional rough theme, used when regenerating suggested_theme.
+
+    Returns:
+        PosterFields: The current fields with every requested one replaced.
+
+    Raises:
+        ValueError: LLaMA did not return all of the requested fields.
+    """
+    client = OpenAI(
+        api_key=os.getenv("GROQ_API_KEY"),
+        base_url="https://api.groq.com/openai/v1",
+        max_retries=0  # Retries would each get the full remaining deadline
+    )
+
+    names = list(dict.fromkeys(names))
+    current = fields.model_dump(exclude_none=True)
+    updates = _regenerate(client, current, names, main_prompt, theme)
+
+    missing = [name for name in names if name not in updates]
+    if missing and updates:
+        logger.warning("✏️ [regenerate-fields] LLaMA left out %s, asking again", missing)
+        updates.update(_regenerate(client, {**current, **updates}, missing, main_prompt, theme))
+        missing = [name for name in names if name not in updates]
+    if missing:
+        raise ValueError(f"LLaMA did not return {', '.join(missing)}")
+
+    return PosterFields.model_validate({**current, **updates})
+
+def _regenerate(client, current: dict, names: list, main_prompt: str = None, theme: str = None) -> dict:
+    """One LLaMA call for `names`; returns the non-empty values it came back with."""
+    context = "\n".join(f"- {key}: {value}" for key, value in current.items() if key not in names)
+    previous = "\n".join(f"- {name}: {current[name]}" for name in names if name in current)
+    constraints = "\n".join(f'- "{name}": {FIELD_CONSTRAINTS[name]}' for name in names)
+
+    prompt = f"""
+You are a professional poster copywriter. Rewrite ONLY these fields: {', '.join(names)}.
+
+POSTER CONTEXT (keep consistent with it, do not repeat it):
+{context or '- (none)'}
+"""
+    if main_prompt:
+        prompt += f"\nORIGINAL REQUEST: {main_prompt}\n"
+    if theme and "suggested_theme" in names:
+        prompt += f"\nROUGH THEME TO EXPAND: {theme}\n"
+    if previous:
+        prompt += f"\nCURRENT VERSIONS (write something noticeably different):\n{previous}\n"
+    prompt += f"""
+FIELD CONSTRAINTS:
+{constraints}
+
+Return ONLY a JSON object with exactly these keys: {', '.join(f'"{name}"' for name in names)}. Use double quotes.
+"""
+
+    raw_response = chat_completion(
+        client,
+        model="moonshotai/kimi-k2-instruct",
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=150 * len(names),
+        temperature=0.7,
+        timeout=stage_timeout("regenerate-fields", LLM_TIMEOUT)
+    )
+
+    parsed_data = clean_and_parse_json(raw_response) or {}
+    return {name: parsed_data[name] for name in names if parsed_data.get(name)}
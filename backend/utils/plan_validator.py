@@ -0,0 +1,163 @@
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+ALL_ASPECT_RATIOS = {"1:1", "16:9", "9:16", "4:3", "3:4", "3:2", "2:3"}
+
+# Map aspect ratios to sizes
+ASPECT_SIZES = {
+    "1:1": "1024x1024",
+    "16:9": "1280x720",
+    "9:16": "720x1280",
+    "4:3": "1024x768",
+    "3:4": "768x1024",
+    "3:2": "1024x683",
+    "2:3": "683x1024"
+}
+
+# What each model can actually do (mirrors the table in the enhance_prompt template).
+# typical_seconds is a generate + download estimate used to skip tiers that can't beat the deadline.
+MODEL_CAPABILITIES = {
+    "imagen-4": {"aspect_ratios": {"1:1", "4:3", "3:4"}, "max_tokens": 420, "default_size": "1024x1024", "typical_seconds": 15},
+    "imagen-3": {"aspect_ratios": {"1:1", "4:3", "3:4"}, "max_tokens": 420, "default_size": "1024x1024", "typical_seconds": 12},
+    "qwen-image": {"aspect_ratios": ALL_ASPECT_RATIOS, "max_tokens": 1800, "default_size": "1024x1024", "typical_seconds": 20},
+    "flux-schnell-v2": {"aspect_ratios": ALL_ASPECT_RATIOS, "max_tokens": 800, "default_size": "1024x1024", "typical_seconds": 6},
+    "sana-1.5": {"aspect_ratios": ALL_ASPECT_RATIOS, "max_tokens": 1800, "default_size": "4096x4096", "typical_seconds": 25}
+}
+
+# Quality-first hierarchy per intent (same rules Kimi is given)
+INTENT_HIERARCHIES = {
+    "people": ["imagen-4", "imagen-3", "qwen-image"],
+    "text-design": ["qwen-image", "imagen-4", "flux-schnell-v2"],
+    "nature": ["qwen-image", "sana-1.5", "flux-schnell-v2"],
+    "artistic": ["flux-schnell-v2", "qwen-image", "imagen-3"],
+    "realistic": ["imagen-3", "imagen-4", "qwen-image"],
+}
+
+# Used to top up any hierarchy that lost models to aspect ratio filtering
+FALLBACK_ORDER = ["qwen-image", "flux-schnell-v2", "sana-1.5", "imagen-4", "imagen-3"]
+
+TIERS = ["primary_model", "secondary_model", "tertiary_model"]
+
+# Rough word -> token ratio for English prompts
+TOKENS_PER_WORD = 1.3
+
+# Loose spellings Kimi sometimes returns (compared with punctuation stripped)
+_MODEL_ALIASES = {
+    "imagen4": "imagen-4",
+    "imagen3": "imagen-3",
+    "qwen": "qwen-image",
+    "qwenimage": "qwen-image",
+    "flux": "flux-schnell-v2",
+    "fluxschnell": "flux-schnell-v2",
+    "fluxschnellv2": "flux-schnell-v2",
+    "sana": "sana-1.5",
+    "sana1.5": "sana-1.5",
+}
+
+
+def normalize_model_name(name) -> str:
+    """
+    Maps Kimi's model names ("Imagen 4", "provider-4/imagen-4", "qwen") onto MODEL_CAPABILITIES keys.
+    Returns None if the name cannot be recognised.
+    """
+    if not isinstance(name, str) or not name.strip():
+        return None
+    name = name.strip().lower().rsplit("/", 1)[-1]
+    if name in MODEL_CAPABILITIES:
+        return name
+    return _MODEL_ALIASES.get(re.sub(r"[^a-z0-9.]", "", name))
+
+
+def supports(model: str, aspect_ratio: str) -> bool:
+    return aspect_ratio in MODEL_CAPABILITIES[model]["aspect_ratios"]
+
+
+def estimate_tokens(prompt: str) -> int:
+    return int(len(prompt.split()) * TOKENS_PER_WORD)
+
+
+def clip_to_token_limit(prompt: str, model: str) -> str:
+    """Trims a prompt to the model's token budget so the provider doesn't reject it."""
+    max_words = int(MODEL_CAPABILITIES[model]["max_tokens"] / TOKENS_PER_WORD)
+    words = prompt.split()
+    if len(words) <= max_words:
+        return prompt
+    return " ".join(words[:max_words])
+
+
+def tier_hierarchy(intent: str, aspect_ratio: str) -> list:
+    """
+    Ordered list of models worth trying for an intent, with unsupported models removed.
+    """
+    ordered = INTENT_HIERARCHIES.get(intent, []) + FALLBACK_ORDER
+    hierarchy = []
+    for model in ordered:
+        if model not in hierarchy and supports(model, aspect_ratio):
+            hierarchy.append(model)
+    return hierarchy
+
+
+def validate_plan(enhanced_data: dict, aspect_ratio: str):
+    """
+    Normalises Kimi's tier plan against MODEL_CAPABILITIES before any image API call.
+
+    Unknown models, unsupported aspect ratios, empty prompts and repeated models are
+    dropped, surviving tiers are moved up in their original order, and free tiers are
+    filled with replacement models from the intent's hierarchy.
+
+    Args:
+        enhanced_data (dict): Parsed JSON from enhance_prompt.
+        aspect_ratio (str): The requested aspect ratio.
+
+    Returns:
+        tuple: (plan dict, list of tier keys whose replacement model still needs a prompt)
+    """
+    valid = []
+    used = set()
+    for tier_key in TIERS:
+        tier = enhanced_data.get(tier_key)
+        if not isinstance(tier, dict):
+            continue
+
+        model = normalize_model_name(tier.get("name"))
+        prompt = tier.get("enhanced_prompt")
+
+        if model is None:
+            logger.warning("⚠️ [plan] %s: unknown model %r, dropping.", tier_key, tier.get("name"))
+            continue
+        if not supports(model, aspect_ratio):
+            logger.warning("⚠️ [plan] %s: %s does not support %s, dropping.", tier_key, model, aspect_ratio)
+            continue
+        if model in used:
+            logger.info("⚠️ [plan] %s: %s already planned, dropping duplicate.", tier_key, model)
+            continue
+        if not isinstance(prompt, str) or not prompt.strip():
+            logger.warning("⚠️ [plan] %s: empty prompt for %s, dropping.", tier_key, model)
+            continue
+
+        used.add(model)
+        valid.append({
+            "name": model,
+            "enhanced_prompt": clip_to_token_limit(prompt.strip(), model),
+            "reasoning": tier.get("reasoning", "")
+        })
+
+    replacements = [m for m in tier_hierarchy(enhanced_data.get("intent"), aspect_ratio) if m not in used]
+    while len(valid) < len(TIERS) and replacements:
+        valid.append({
+            "name": replacements.pop(0),
+            "enhanced_prompt": None,
+            "reasoning": "Replacement for an invalid tier"
+        })
+
+    plan = {key: value for key, value in enhanced_data.items() if key not in TIERS}
+    plan["aspect_ratio"] = aspect_ratio
+    pending = []
+    for tier_key, tier in zip(TIERS, valid):
+        plan[tier_key] = tier
+        if tier["enhanced_prompt"] is None:
+            pending.append(tier_key)
+
+    return plan, pending
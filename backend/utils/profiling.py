@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import secrets
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from typing import Optional
+from fastapi.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from backend.utils.quota import is_admin
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 🔬 Middleware is only installed when this is on, so it costs nothing otherwise
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+
+# Requests slower than this are kept; faster ones are discarded unless marked by header
+PROFILE_SLOW_MS = float(os.getenv("PROFILE_SLOW_MS", "2000"))
+
+# Send "X-Profile: 1" (with a valid X-Admin-Token) to force a capture
+PROFILE_HEADER = "x-profile"
+ADMIN_HEADER = "x-admin-token"
+
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5")) / 1000
+LOOP_LAG_INTERVAL = float(os.getenv("PROFILE_LOOP_LAG_INTERVAL_MS", "50")) / 1000
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+
+
+class ProfileSession:
+    """
+    Samples and event-loop lag collected while one request was in flight.
+    """
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.samples = 0
+        self.lags = []
+
+    def loop_lag_summary(self) -> dict:
+        if not self.lags:
+            return {"max_ms": 0.0, "avg_ms": 0.0}
+        return {
+            "max_ms": round(max(self.lags) * 1000, 2),
+            "avg_ms": round(sum(self.lags) / len(self.lags) * 1000, 2)
+        }
+
+
+def _collapse(thread_name: str, frame) -> str:
+    """Turns a frame into a root-first "thread;file:func;file:func" line."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    parts.append(thread_name)
+    return ";".join(reversed(parts))
+
+
+class SamplingProfiler:
+    """
+    One background thread samples every thread's stack while any session is open.
+
+    Samples from overlapping requests land in every open session, so captures
+    under heavy concurrency show the whole process rather than one request.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self) -> ProfileSession:
+        session = ProfileSession()
+        with self._lock:
+            self._sessions.add(session)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+                self._thread.start()
+        return session
+
+    def stop(self, session: ProfileSession):
+        with self._lock:
+            self._sessions.discard(session)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                sessions = list(self._sessions)
+
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks = [
+                _collapse(names.get(thread_id, str(thread_id)), frame)
+                for thread_id, frame in sys._current_frames().items()
+                if thread_id != own_id
+            ]
+            for session in sessions:
+                session.stacks.update(stacks)
+                session.samples += 1
+
+            time.sleep(self.interval)
+
+
+class LoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from a short sleep; blocking work on
+    the loop (sync LLM calls, base64 of big images) shows up directly as lag.
+    """
+
+    def __init__(self, profiler: SamplingProfiler, interval: float = LOOP_LAG_INTERVAL):
+        self.profiler = profiler
+        self.interval = interval
+        self._task = None
+
+    def ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - start - self.interval)
+            with self.profiler._lock:
+                sessions = list(self.profiler._sessions)
+            for session in sessions:
+                session.lags.append(lag)
+
+
+class ProfileStore:
+    """
+    Writes captures as collapsed-stack ".folded" files (flamegraph.pl / speedscope)
+    with a ".json" sidecar holding request metadata.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = directory
+        self.keep = keep
+
+    @staticmethod
+    def new_id(method: str, path: str) -> str:
+        # Sortable by time; the random suffix keeps same-millisecond captures of one path apart
+        slug = re.sub(r"[^a-zA-Z0-9]+", "-", path).strip("-").lower() or "root"
+        millis = int(time.time() * 1000) % 1000
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{millis:03d}-{method.lower()}-{slug}-{secrets.token_hex(2)}"
+
+    def save(self, session: ProfileSession, profile_id: str, method: str, path: str, elapsed_ms: float, reason: str):
+        """Writes one capture and prunes old ones. Blocking file I/O - keep it off the event loop."""
+        os.makedirs(self.directory, exist_ok=True)
+
+        with open(os.path.join(self.directory, f"{profile_id}.folded"), "w") as f:
+            for stack, count in session.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        metadata = {
+            "id": profile_id,
+            "method": method,
+            "path": path,
+            "latency_ms": round(elapsed_ms, 2),
+            "reason": reason,
+            "samples": session.samples,
+            "loop_lag": session.loop_lag_summary(),
+            "created_at": time.time()
+        }
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump(metadata, f)
+
+        self._prune()
+
+    def _prune(self):
+        ids = sorted(name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json"))
+        for profile_id in ids[:-self.keep] if self.keep > 0 else []:
+            for ext in (".json", ".folded"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + ext))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> list:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+        return profiles
+
+    def read(self, profile_id: str) -> Optional[str]:
+        """Collapsed stacks of one capture, or None if there is no such profile. Blocking file I/O."""
+        path = self.folded_path(profile_id)
+        if path is None:
+            return None
+        with open(path) as f:
+            return f.read()
+
+    def folded_path(self, profile_id: str) -> str:
+        # Ids are generated by save(); refuse anything that could escape the directory
+        if not re.fullmatch(r"[a-z0-9-]+", profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.folded")
+        return path if os.path.exists(path) else None
+
+
+profiler = SamplingProfiler()
+loop_lag_monitor = LoopLagMonitor(profiler)
+profile_store = ProfileStore()
+
+
+async def profiling_middleware(request, call_next):
+    """
+    Samples every request and keeps the capture if it was slow or an admin asked for it via X-Profile.
+
+    call_next returns once headers are ready, so the capture is finished when the body
+    has been sent; for SSE endpoints that is the end of the stream.
+    """
+    loop_lag_monitor.ensure_running()
+    session = profiler.start()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        profiler.stop(session)
+        raise
+
+    method, path = request.method, request.url.path
+    profile_id = profile_store.new_id(method, path)
+    # Forced captures write to disk regardless of latency, so only admins may ask for them
+    forced = request.headers.get(PROFILE_HEADER) == "1" and is_admin(request.headers.get(ADMIN_HEADER))
+    # The id can only be announced while headers are unsent: forced, or already slow at this point
+    if forced or (time.perf_counter() - start) * 1000 >= PROFILE_SLOW_MS:
+        response.headers["X-Profile-Id"] = profile_id
+
+    finished = False
+
+    def finish():
+        nonlocal finished
+        if finished:
+            return
+        finished = True
+        profiler.stop(session)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if forced or elapsed_ms >= PROFILE_SLOW_MS:
+            reason = "header" if forced else "slow"
+            asyncio.ensure_future(run_in_threadpool(profile_store.save, session, profile_id, method, path, elapsed_ms, reason))
+            logger.info("🔬 [profiling] Captured %s %s (%.0f ms, %s) -> %s", method, path, elapsed_ms, reason, profile_id)
+
+    body_iterator = response.body_iterator
+
+    async def timed_body():
+        try:
+            async for chunk in body_iterator:
+                yield chunk
+        finally:
+            finish()
+
+    response.body_iterator = timed_body()
+    # Body never iterated (client gone before the first chunk): stop sampling anyway, without saving
+    weakref.finalize(response.body_iterator, lambda: finished or profiler.stop(session))
+    return response
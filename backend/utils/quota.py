@@ -0,0 +1,300 @@
+import asyncio
+import heapq
+import hmac
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _parse_mapping(raw: str) -> dict:
+    """
+    Parses "key:value,key2:value2" strings from the environment into a dict.
+    """
+    mapping = {}
+    for pair in raw.split(","):
+        if ":" not in pair:
+            continue
+        key, value = pair.split(":", 1)
+        if key.strip():
+            mapping[key.strip()] = value.strip()
+    return mapping
+
+
+# 🔑 API key -> tenant id (e.g. "key-abc:marketing,key-def:sales").
+# Keys not listed here are rejected.
+TENANT_API_KEYS = _parse_mapping(os.getenv("TENANT_API_KEYS", ""))
+
+# ⚠️ Open mode: any unregistered X-API-Key becomes its own tenant. Dev only - every new
+# key gets fresh buckets, so it offers no protection against a caller rotating keys.
+TENANT_OPEN_MODE = os.getenv("TENANT_OPEN_MODE", "false").lower() == "true"
+
+# ⚖️ Relative share of image generation capacity per tenant (default weight is 1)
+TENANT_WEIGHTS = {
+    tenant: float(weight)
+    for tenant, weight in _parse_mapping(os.getenv("TENANT_WEIGHTS", "")).items()
+}
+
+# 🪣 Token bucket settings per resource: refill per minute + burst capacity
+QUOTA_LIMITS = {
+    "images": {
+        "per_minute": float(os.getenv("TENANT_IMAGE_QUOTA_PER_MINUTE", "6")),
+        "burst": float(os.getenv("TENANT_IMAGE_QUOTA_BURST", "9")),
+    },
+    "llm": {
+        "per_minute": float(os.getenv("TENANT_LLM_QUOTA_PER_MINUTE", "20")),
+        "burst": float(os.getenv("TENANT_LLM_QUOTA_BURST", "20")),
+    },
+    # Progressive previews are billed separately from final images
+    "previews": {
+        "per_minute": float(os.getenv("TENANT_PREVIEW_QUOTA_PER_MINUTE", "6")),
+        "burst": float(os.getenv("TENANT_PREVIEW_QUOTA_BURST", "6")),
+    },
+}
+
+# 👀 Tenants that never get progressive previews (comma-separated)
+PREVIEW_DISABLED_TENANTS = {
+    tenant.strip() for tenant in os.getenv("TENANT_PREVIEW_DISABLED", "").split(",") if tenant.strip()
+}
+
+# Buckets that have refilled to full are dropped this often (a new bucket starts full anyway)
+QUOTA_EVICT_INTERVAL = float(os.getenv("QUOTA_EVICT_INTERVAL_SECONDS", "60"))
+
+# 🖼️ How many image generations may hit the upstream provider at once
+IMAGE_GENERATION_SLOTS = int(os.getenv("IMAGE_GENERATION_SLOTS", "4"))
+
+
+def identify_tenant(api_key: Optional[str], client_host: Optional[str]) -> Optional[str]:
+    """
+    Resolves the tenant for a request.
+
+    Args:
+        api_key (str): Value of the X-API-Key header, if any.
+        client_host (str): Remote address, used for anonymous callers.
+
+    Returns:
+        str: Tenant id, or None if a key was sent that is not registered (and open mode is off).
+    """
+    if api_key:
+        if api_key in TENANT_API_KEYS:
+            return TENANT_API_KEYS[api_key]
+        return api_key if TENANT_OPEN_MODE else None
+    return f"anonymous:{client_host or 'unknown'}"
+
+
+def is_admin(admin_token: Optional[str]) -> bool:
+    """
+    Whether an X-Admin-Token value grants admin access. Without ADMIN_TOKEN configured nobody is admin.
+    """
+    expected = os.getenv("ADMIN_TOKEN")
+    return bool(expected and admin_token) and hmac.compare_digest(admin_token, expected)
+
+
+def preview_enabled(tenant: str) -> bool:
+    return tenant not in PREVIEW_DISABLED_TENANTS
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and refills at `rate` tokens per second.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def retry_after(self, units: float) -> int:
+        """Seconds until `units` tokens will be available."""
+        missing = units - self.tokens
+        if missing <= 0:
+            return 0
+        if self.rate <= 0:
+            return 60
+        return max(1, math.ceil(missing / self.rate))
+
+
+class QuotaResult:
+    def __init__(self, allowed: bool, remaining: Dict[str, int], retry_after: Optional[int] = 0):
+        self.allowed = allowed
+        self.remaining = remaining
+        # None: the request is larger than a bucket can ever hold, so waiting will not help
+        self.retry_after = retry_after
+
+    @property
+    def satisfiable(self) -> bool:
+        return self.retry_after is not None
+
+    def headers(self) -> Dict[str, str]:
+        """Response headers reporting the remaining quota per resource."""
+        headers = {
+            f"X-Quota-{resource.capitalize()}-Remaining": str(value)
+            for resource, value in self.remaining.items()
+        }
+        if not self.allowed and self.satisfiable:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+class QuotaManager:
+    """
+    Per-tenant token buckets for every resource in QUOTA_LIMITS.
+    """
+
+    def __init__(self, limits: dict = None):
+        self.limits = limits or QUOTA_LIMITS
+        self._buckets: Dict[tuple, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._last_eviction = time.monotonic()
+
+    def _bucket(self, tenant: str, resource: str) -> TokenBucket:
+        key = (tenant, resource)
+        if key not in self._buckets:
+            limit = self.limits[resource]
+            self._buckets[key] = TokenBucket(limit["burst"], limit["per_minute"] / 60.0)
+        return self._buckets[key]
+
+    def consume(self, tenant: str, units: Dict[str, float]) -> QuotaResult:
+        """
+        Atomically takes `units` from each resource bucket of the tenant.
+        Nothing is consumed unless every bucket has enough tokens.
+
+        Args:
+            tenant (str): Tenant id from identify_tenant.
+            units (dict): Resource name -> tokens to take (e.g. {"images": 3, "llm": 1}).
+
+        Returns:
+            QuotaResult: Whether the request is allowed plus remaining tokens
+                (retry_after is None if it exceeds a bucket's capacity).
+        """
+        with self._lock:
+            self._evict_idle()
+            buckets = {resource: self._bucket(tenant, resource) for resource in units}
+            for bucket in buckets.values():
+                bucket.refill()
+
+            if any(units[r] > buckets[r].capacity for r in units):
+                return QuotaResult(False, {r: int(b.tokens) for r, b in buckets.items()}, None)
+
+            retry_after = max(buckets[r].retry_after(units[r]) for r in units)
+            allowed = retry_after == 0
+            if allowed:
+                for resource, bucket in buckets.items():
+                    bucket.tokens -= units[resource]
+
+            remaining = {r: int(b.tokens) for r, b in buckets.items()}
+            return QuotaResult(allowed, remaining, retry_after)
+
+    def _evict_idle(self):
+        # Caller holds the lock. A full bucket is indistinguishable from a new one, so dropping it is free.
+        now = time.monotonic()
+        if now - self._last_eviction < QUOTA_EVICT_INTERVAL:
+            return
+        self._last_eviction = now
+        for key, bucket in list(self._buckets.items()):
+            bucket.refill()
+            if bucket.tokens >= bucket.capacity:
+                del self._buckets[key]
+
+
+class FairScheduler:
+    """
+    Weighted fair queuing in front of the image generators.
+
+    Each waiting request gets a virtual finish tag of
+    max(virtual_time, tenant's last tag) + cost / weight, and free slots are
+    always handed to the smallest tag. A tenant looping on count=3 therefore
+    queues behind its own earlier work instead of starving everyone else.
+    """
+
+    def __init__(self, slots: int = IMAGE_GENERATION_SLOTS, weights: dict = None):
+        self.slots = max(1, slots)
+        self.weights = weights if weights is not None else TENANT_WEIGHTS
+        self._active = 0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for entry in self._queue if not entry[3].cancelled())
+
+    async def acquire(self, tenant: str, cost: float = 1.0):
+        weight = self.weights.get(tenant, 1.0)
+        start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+        finish = start + cost / weight
+        self._last_finish[tenant] = finish
+
+        if self._active < self.slots and not self._queue:
+            self._active += 1
+            self._virtual_time = start
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (finish, next(self._sequence), start, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed to us right before we were cancelled
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._queue:
+            _, _, start, future = heapq.heappop(self._queue)
+            if future.cancelled():
+                continue
+            # Slot is handed over directly, so the active count stays the same
+            self._virtual_time = max(self._virtual_time, start)
+            future.set_result(None)
+            return
+        self._active -= 1
+        if self._active == 0:
+            # Idle: forget old tags so returning tenants are not penalised forever
+            self._last_finish.clear()
+
+    @asynccontextmanager
+    async def slot(self, tenant: str, cost: float = 1.0):
+        await self.acquire(tenant, cost)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class UsageLedger:
+    """
+    Running totals of what each tenant actually consumed (images, previews, ...), for billing.
+    """
+
+    def __init__(self):
+        self._usage: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tenant: str, kind: str, units: int = 1):
+        with self._lock:
+            tenant_usage = self._usage.setdefault(tenant, {})
+            tenant_usage[kind] = tenant_usage.get(kind, 0) + units
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {tenant: dict(usage) for tenant, usage in self._usage.items()}
+
+
+quota_manager = QuotaManager()
+usage_ledger = UsageLedger()
+image_scheduler = FairScheduler()
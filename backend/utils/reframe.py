@@ -0,0 +1,142 @@
+import asyncio
+import base64
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageFilter, ImageOps
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 🖼️ CPU workers for cropping/padding renditions (0 = one per core)
+REFRAME_WORKERS = int(os.getenv("REFRAME_WORKERS", "0")) or None
+
+# Never crop away more than this share of the master; the remainder is padded instead
+REFRAME_MIN_KEEP = float(os.getenv("REFRAME_MIN_KEEP", "0.5"))
+
+# Saliency is computed on a thumbnail this size (long side, px)
+SALIENCY_THUMBNAIL = 128
+
+_pool = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # Created inside a running, multi-threaded server: forking could copy a held lock into
+        # the child, so workers start from a clean forkserver process instead
+        _pool = ProcessPoolExecutor(max_workers=REFRAME_WORKERS, mp_context=multiprocessing.get_context("forkserver"))
+    return _pool
+
+
+def shutdown_pool():
+    """Stops the reframing workers (app shutdown)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def _salient_offset(image: Image.Image, window: float, horizontal: bool) -> float:
+    """
+    Finds where a window of `window` (fraction of the axis) captures the most edge energy.
+
+    Args:
+        image (Image): Source image.
+        window (float): Window length as a fraction of the axis, 0-1.
+        horizontal (bool): Slide along x (True) or y (False).
+
+    Returns:
+        float: Start of the best window as a fraction of the axis.
+    """
+    thumb = image.convert("L")
+    thumb.thumbnail((SALIENCY_THUMBNAIL, SALIENCY_THUMBNAIL))
+    edges = thumb.filter(ImageFilter.FIND_EDGES)
+    width, height = edges.size
+    pixels = edges.load()
+
+    if horizontal:
+        profile = [sum(pixels[x, y] for y in range(height)) for x in range(width)]
+    else:
+        profile = [sum(pixels[x, y] for x in range(width)) for y in range(height)]
+
+    length = len(profile)
+    span = max(1, min(length, round(window * length)))
+    centre = (length - span) / 2
+
+    current = sum(profile[:span])
+    best_start, best_score = 0, (current, -abs(0 - centre))
+    for start in range(1, length - span + 1):
+        current += profile[start + span - 1] - profile[start - 1]
+        # Ties go to the most central window
+        score = (current, -abs(start - centre))
+        if score > best_score:
+            best_start, best_score = start, score
+
+    return best_start / length
+
+
+def reframe_image(master_base64: str, target_size: str) -> str:
+    """
+    Derives one rendition from the master image: saliency-aware crop towards the target
+    aspect ratio, then blurred padding for whatever cropping alone may not remove.
+
+    Runs in a worker process.
+
+    Args:
+        master_base64 (str): Master image, base64-encoded (any format Pillow reads).
+        target_size (str): "WIDTHxHEIGHT", e.g. "1280x720".
+
+    Returns:
+        str: Base64-encoded PNG at exactly target_size.
+    """
+    target_w, target_h = (int(v) for v in target_size.split("x"))
+    # Decoded here, in the worker: a native-size master is several MB and would stall the event loop
+    image = Image.open(io.BytesIO(base64.b64decode(master_base64))).convert("RGB")
+    width, height = image.size
+    target_ratio = target_w / target_h
+
+    if target_ratio > width / height:
+        # Target is wider: drop rows
+        keep = max(width / target_ratio / height, REFRAME_MIN_KEEP)
+        top = _salient_offset(image, keep, horizontal=False) * height
+        region = image.crop((0, round(top), width, round(top + keep * height)))
+    else:
+        # Target is taller: drop columns
+        keep = max(height * target_ratio / width, REFRAME_MIN_KEEP)
+        left = _salient_offset(image, keep, horizontal=True) * width
+        region = image.crop((round(left), 0, round(left + keep * width), height))
+
+    if abs(region.width / region.height - target_ratio) < 0.01:
+        result = region.resize((target_w, target_h), Image.LANCZOS)
+    else:
+        # Pad: blurred cover of the same region behind a fitted copy
+        result = ImageOps.fit(region, (target_w, target_h), Image.LANCZOS)
+        result = result.filter(ImageFilter.GaussianBlur(radius=max(target_w, target_h) // 40))
+        foreground = ImageOps.contain(region, (target_w, target_h), Image.LANCZOS)
+        result.paste(foreground, ((target_w - foreground.width) // 2, (target_h - foreground.height) // 2))
+
+    buffer = io.BytesIO()
+    result.save(buffer, format="PNG", optimize=False)
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+async def reframe_all(master_base64: str, sizes: dict) -> dict:
+    """
+    Builds every rendition in parallel on the process pool.
+
+    Args:
+        master_base64 (str): The generated master image.
+        sizes (dict): Aspect ratio -> "WIDTHxHEIGHT".
+
+    Returns:
+        dict: Aspect ratio -> base64 PNG.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    results = await asyncio.gather(*(
+        loop.run_in_executor(pool, reframe_image, master_base64, size)
+        for size in sizes.values()
+    ))
+    return dict(zip(sizes.keys(), results))
@@ -0,0 +1,221 @@
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import httpx
+import openai
+import requests
+from dotenv import load_dotenv
+from backend.utils.deadline import check_deadline, stage_timeout
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 📼 off | record | replay
+REPLAY_MODE = os.getenv("UPSTREAM_REPLAY_MODE", "off").lower()
+
+# Append-only gzip'd JSON lines, one upstream exchange per line
+CASSETTE_PATH = os.getenv("UPSTREAM_CASSETTE", "recordings/upstream.jsonl.gz")
+
+# Multiply recorded latencies on replay (0 = instant, 1 = as recorded)
+LATENCY_SCALE = float(os.getenv("UPSTREAM_REPLAY_LATENCY_SCALE", "1.0"))
+
+
+class ReplayMissError(requests.RequestException):
+    """Raised in replay mode when no recording matches an outbound request."""
+
+
+class ReplayedResponse:
+    """
+    The small slice of requests.Response that our generators use.
+    """
+
+    def __init__(self, url: str, status_code: int, content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error (replayed) for url: {self.url}", response=self)
+
+
+class Cassette:
+    """
+    Stores upstream request/response pairs with their timings and serves them back.
+
+    Requests are keyed by a hash of their semantic content (model, messages, URL, JSON body);
+    credentials and timeouts are never part of the key. Repeated identical requests are
+    replayed in the order they were recorded, cycling when the recording runs out.
+    """
+
+    def __init__(self, path: str = CASSETTE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+        self._cursors = {}
+
+    @staticmethod
+    def key(kind: str, request: dict) -> str:
+        canonical = json.dumps({"kind": kind, "request": request}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def record(self, key: str, entry: dict):
+        entry["key"] = key
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Each append is its own gzip member; gzip.open reads them back as one stream
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+
+    def _load(self):
+        self._entries = {}
+        if not os.path.exists(self.path):
+            logger.warning("⚠️ [replay] No cassette at %s", self.path)
+            return
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], []).append(entry)
+        logger.info("📼 [replay] Loaded %d recordings from %s", sum(len(v) for v in self._entries.values()), self.path)
+
+    def lookup(self, key: str) -> dict:
+        with self._lock:
+            if self._entries is None:
+                self._load()
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            cursor = self._cursors.get(key, 0)
+            self._cursors[key] = cursor + 1
+            return entries[cursor % len(entries)]
+
+
+cassette = Cassette()
+
+
+def _sleep_recorded(entry: dict, stage: str, timeout: float = None) -> bool:
+    """
+    Waits out the recorded latency, but never past the call's timeout or the request deadline.
+
+    Raises DeadlineExceeded/RequestCancelled like the live call would end up doing.
+
+    Returns:
+        bool: False if the call's own timeout cut the wait short (the caller raises its timeout error).
+    """
+    delay = entry.get("elapsed", 0.0) * LATENCY_SCALE
+    if delay <= 0:
+        return True
+    wait = stage_timeout(stage, delay)
+    if timeout is not None:
+        wait = min(wait, timeout)
+    time.sleep(wait)
+    if wait < delay:
+        check_deadline(stage)
+        return False
+    return True
+
+
+def chat_completion(client, **kwargs) -> str:
+    """
+    Calls client.chat.completions.create and returns the message content,
+    recording or replaying the exchange depending on UPSTREAM_REPLAY_MODE.
+    """
+    if REPLAY_MODE == "off":
+        return _create_chat(client, kwargs)
+
+    request = {
+        "base_url": str(client.base_url),
+        "model": kwargs.get("model"),
+        "messages": kwargs.get("messages"),
+        "temperature": kwargs.get("temperature"),
+        "max_tokens": kwargs.get("max_tokens"),
+    }
+    key = Cassette.key("chat", request)
+
+    if REPLAY_MODE == "replay":
+        entry = cassette.lookup(key)
+        if entry is None:
+            raise ReplayMissError(f"No recorded chat completion for model {request['model']}")
+        if not _sleep_recorded(entry, f"{request['model']} completion", kwargs.get("timeout")):
+            raise openai.APITimeoutError(request=httpx.Request("POST", request["base_url"]))
+        if "error" in entry:
+            raise RuntimeError(entry["error"])
+        return entry["content"]
+
+    start = time.perf_counter()
+    try:
+        content = _create_chat(client, kwargs)
+    except Exception as e:
+        cassette.record(key, {"kind": "chat", "request": request, "elapsed": time.perf_counter() - start, "error": str(e)})
+        raise
+    cassette.record(key, {"kind": "chat", "request": request, "elapsed": time.perf_counter() - start, "content": content})
+    return content
+
+
+def _create_chat(client, kwargs: dict) -> str:
+    try:
+        return client.chat.completions.create(**kwargs).choices[0].message.content
+    except openai.APITimeoutError:
+        # The timeout is clamped to the request's remaining budget (stage_timeout); if that is
+        # what ran out, report the deadline (504) rather than an upstream failure
+        check_deadline(f"{kwargs.get('model')} completion")
+        raise
+
+
+def _http(method: str, url: str, json_body=None, **kwargs):
+    send = requests.post if method == "POST" else requests.get
+    if REPLAY_MODE == "off":
+        return send(url, json=json_body, **kwargs) if json_body is not None else send(url, **kwargs)
+
+    request = {"method": method, "url": url, "json": json_body}
+    key = Cassette.key("http", request)
+
+    if REPLAY_MODE == "replay":
+        entry = cassette.lookup(key)
+        if entry is None:
+            raise ReplayMissError(f"No recorded {method} for {url}")
+        if not _sleep_recorded(entry, f"{method} {url}", kwargs.get("timeout")):
+            raise requests.Timeout(f"Replayed {method} {url} timed out")
+        if "error" in entry:
+            raise requests.RequestException(entry["error"])
+        return ReplayedResponse(url, entry["status"], base64.b64decode(entry["body"]))
+
+    start = time.perf_counter()
+    try:
+        response = send(url, json=json_body, **kwargs) if json_body is not None else send(url, **kwargs)
+    except requests.RequestException as e:
+        cassette.record(key, {"kind": "http", "request": request, "elapsed": time.perf_counter() - start, "error": str(e)})
+        raise
+    cassette.record(key, {
+        "kind": "http",
+        "request": request,
+        "elapsed": time.perf_counter() - start,
+        "status": response.status_code,
+        "body": base64.b64encode(response.content).decode("ascii")
+    })
+    return response
+
+
+def http_post(url: str, json=None, **kwargs):
+    """requests.post with record/replay support."""
+    return _http("POST", url, json_body=json, **kwargs)
+
+
+def http_get(url: str, **kwargs):
+    """requests.get with record/replay support."""
+    return _http("GET", url, **kwargs)
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from fastapi.concurrency import run_in_threadpool
+from dotenv import load_dotenv
+from backend.models.schema import PosterFields
+from backend.utils.admission import AdmissionTicket, limiters
+from backend.utils.deadline import DEFAULT_DEADLINES, Deadline, set_current_deadline
+from backend.utils.extended_image_generator import generate_poster_image
+from backend.utils.prompt_builder import build_image_generation_prompt
+from backend.utils.quota import image_scheduler
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 🔮 Server-side switch; clients still have to opt in per request
+SPECULATION_ENABLED = os.getenv("SPECULATION_ENABLED", "false").lower() == "true"
+
+# Unclaimed speculative posters are cancelled/evicted after this many seconds
+SPECULATION_TTL = float(os.getenv("SPECULATION_TTL_SECONDS", "120"))
+
+# Upper bound on finished-but-unclaimed posters held in memory
+SPECULATION_MAX_ENTRIES = int(os.getenv("SPECULATION_MAX_ENTRIES", "64"))
+
+# Upper bound on speculative renders running at once (they also need a free image admission slot)
+SPECULATION_MAX_IN_FLIGHT = int(os.getenv("SPECULATION_MAX_IN_FLIGHT", "4"))
+
+
+def fields_fingerprint(fields: PosterFields) -> str:
+    """
+    Hash of the fields that feed the image prompt, ignoring case and whitespace-only edits.
+    """
+    normalized = {
+        key: " ".join(value.lower().split())
+        for key, value in fields.model_dump(exclude_none=True).items()
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class SpeculativeJob:
+    def __init__(self, token: str, tenant: str, fingerprint: str, task: asyncio.Task, deadline: Deadline):
+        self.token = token
+        self.tenant = tenant
+        self.fingerprint = fingerprint
+        self.task = task
+        self.deadline = deadline
+        self.created = time.monotonic()
+
+
+class SpeculationCache:
+    """
+    Background poster generations started right after /generate-fields, keyed by token
+    and by (tenant, fields fingerprint), waiting for the matching /generate-poster.
+    """
+
+    def __init__(self, ttl: float = SPECULATION_TTL, max_entries: int = SPECULATION_MAX_ENTRIES,
+                 max_in_flight: int = SPECULATION_MAX_IN_FLIGHT):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_in_flight = max_in_flight
+        self._jobs = {}
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.wasted_images = 0
+        self.skipped = 0
+
+    @property
+    def in_flight(self) -> int:
+        return sum(1 for job in self._jobs.values() if not job.task.done())
+
+    def reserve(self):
+        """
+        Admission for one speculative render: None when too many are already running or
+        the image limiter has no free slot (speculation never queues behind real requests).
+
+        Returns:
+            AdmissionTicket: Pass to start(), or abandon() it if the render won't happen.
+        """
+        if self.in_flight >= self.max_in_flight or not limiters["image"].try_acquire():
+            self.skipped += 1
+            return None
+        return AdmissionTicket(limiters["image"])
+
+    def start(self, tenant: str, fields: PosterFields, ticket: AdmissionTicket) -> str:
+        """
+        Starts build_image_generation_prompt + generate_poster_image in the background.
+
+        Args:
+            tenant (str): Tenant the render is billed to.
+            fields (PosterFields): Fields from /generate-fields.
+            ticket (AdmissionTicket): From reserve(); released when the render ends.
+
+        Returns:
+            str: Token the client can send back with /generate-poster.
+        """
+        self._evict(expired_only=True)
+        while len(self._jobs) >= self.max_entries:
+            oldest = min(self._jobs.values(), key=lambda job: job.created)
+            self._discard(oldest)
+
+        token = uuid.uuid4().hex
+        deadline = Deadline(DEFAULT_DEADLINES["/generate-poster"])
+
+        async def run():
+            set_current_deadline(deadline)
+            raw_prompt = build_image_generation_prompt(fields)
+            async with image_scheduler.slot(tenant):
+                return await run_in_threadpool(generate_poster_image, raw_prompt)
+
+        def finished(t: asyncio.Task):
+            if t.cancelled():
+                ticket.abandon()
+                return
+            # Also keeps unclaimed failures from surfacing as "exception was never retrieved"
+            ticket.success = t.exception() is None
+            ticket.release()
+
+        task = asyncio.ensure_future(run())
+        task.add_done_callback(finished)
+        self._jobs[token] = SpeculativeJob(token, tenant, fields_fingerprint(fields), task, deadline)
+        self.started += 1
+
+        asyncio.get_running_loop().call_later(self.ttl, self._evict, True)
+        logger.info("🔮 [speculation] Started poster pre-generation %s for %s", token[:8], tenant)
+        return token
+
+    def claim(self, tenant: str, fields: PosterFields, token: str = None):
+        """
+        Hands over the in-flight or finished job matching these fields, if any.
+        A token only matches when its fields still do; otherwise the fingerprint is searched.
+        """
+        fingerprint = fields_fingerprint(fields)
+        job = self._jobs.get(token) if token else None
+        if job is not None and job.tenant == tenant and job.fingerprint != fingerprint:
+            # The user edited the fields: this render is superseded, stop paying for it now
+            self._discard(job)
+            job = None
+        if job is None or job.tenant != tenant:
+            job = next(
+                (j for j in self._jobs.values() if j.tenant == tenant and j.fingerprint == fingerprint),
+                None
+            )
+
+        if job is None:
+            self.misses += 1
+            return None
+
+        del self._jobs[job.token]
+        self.hits += 1
+        logger.info("🔮 [speculation] Hit %s (%s)", job.token[:8], "done" if job.task.done() else "in flight")
+        return job
+
+    def _discard(self, job: SpeculativeJob):
+        del self._jobs[job.token]
+        if job.task.done():
+            if not job.task.cancelled() and job.task.exception() is None:
+                # Paid for upstream and never shown to anyone
+                self.wasted_images += 1
+        else:
+            job.deadline.cancel()
+            job.task.cancel()
+            self.cancelled += 1
+
+    def _evict(self, expired_only: bool = True):
+        now = time.monotonic()
+        for job in list(self._jobs.values()):
+            if not expired_only or now - job.created >= self.ttl:
+                self._discard(job)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": SPECULATION_ENABLED,
+            "started": self.started,
+            "pending": len(self._jobs),
+            "in_flight": self.in_flight,
+            "skipped": self.skipped,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "cancelled": self.cancelled,
+            "wasted_images": self.wasted_images
+        }
+
+
+speculation_cache = SpeculationCache()
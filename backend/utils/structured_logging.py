@@ -0,0 +1,206 @@
+import atexit
+import contextvars
+import copy
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+import orjson
+from logging.handlers import QueueHandler, QueueListener
+from pydantic import BaseModel
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 📜 DEBUG also emits (sampled) payloads: raw LLM responses, enhanced plans, request bodies
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# "json" (one object per line, for log shippers) or "text" (for local development)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+# Share of DEBUG/INFO records that keep their payloads; the rest log a placeholder
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.1"))
+
+# Payloads are cut to this many characters
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+
+# Records waiting for the writer thread; further records are dropped rather than blocking
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Accept caller-supplied ids only if they look like ids
+_REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._:-]{1,64}")
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came in through `extra=` and is emitted as a field
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+_listener = None
+
+
+class Payload:
+    """
+    Defers serialising a large value until the record is actually emitted.
+
+    Use as a %-style argument: logger.debug("Plan: %s", Payload(plan)).
+    Nothing is dumped when the level is disabled or the payload is not sampled.
+    """
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self) -> str:
+        value = self.value
+        if isinstance(value, BaseModel):
+            value = value.model_dump(exclude_none=True)
+        if isinstance(value, (dict, list)):
+            text = orjson.dumps(value, default=str).decode("utf-8")
+        else:
+            text = str(value)
+        if len(text) > LOG_PAYLOAD_MAX_CHARS:
+            text = f"{text[:LOG_PAYLOAD_MAX_CHARS]}... ({len(text)} chars)"
+        return text
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps the current request id on every record, in the thread that logged it."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+
+class PayloadSampler(logging.Filter):
+    """
+    Keeps payloads on LOG_PAYLOAD_SAMPLE_RATE of DEBUG/INFO records; warnings and errors always keep them.
+    """
+
+    def __init__(self, rate: float = LOG_PAYLOAD_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not isinstance(record.args, tuple):
+            return True
+        if any(isinstance(arg, Payload) for arg in record.args) and random.random() >= self.rate:
+            record.args = tuple("<payload not sampled>" if isinstance(arg, Payload) else arg for arg in record.args)
+        return True
+
+
+# Args that are safe to hand to another thread as-is
+_IMMUTABLE_ARGS = (str, bytes, int, float, bool, type(None))
+
+
+def _freeze(arg):
+    if isinstance(arg, _IMMUTABLE_ARGS):
+        return arg
+    if isinstance(arg, Payload):
+        # Shallow snapshot; serialising it is left to the writer thread
+        value = arg.value
+        return Payload(copy.copy(value) if isinstance(value, (dict, list)) else value)
+    # Small values (exceptions, lists of names): str() now, before the caller can change them
+    return str(arg)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler that drops records instead of blocking the caller when the queue is full,
+    and leaves all formatting to the listener thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock prepare() formats the message (and traceback) on the logging thread and
+        # drops exc_info; instead only freeze mutable args and pass msg/args/exc_info through
+        record = copy.copy(record)
+        if isinstance(record.args, tuple):
+            record.args = tuple(_freeze(arg) for arg in record.args)
+        elif isinstance(record.args, dict):
+            record.args = {key: _freeze(value) for key, value in record.args.items()}
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, request id, message and any `extra=` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", None),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+def configure_logging():
+    """
+    Routes every logger through a bounded queue to a single writer thread.
+
+    Request handlers only pay for building the record; formatting and the
+    stdout write happen on the listener thread. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "text":
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    queue_handler.addFilter(RequestContextFilter())
+    queue_handler.addFilter(PayloadSampler())
+
+    # LOG_LEVEL applies to our own modules; third-party DEBUG (HTTP client internals) stays off
+    level = logging.getLevelName(LOG_LEVEL)
+    logging.getLogger("backend").setLevel(level)
+    root = logging.getLogger()
+    root.setLevel(max(level, logging.INFO))
+    root.addHandler(queue_handler)
+
+    _listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+async def request_id_middleware(request, call_next):
+    """
+    Tags the request (and every log record and task it spawns) with an id, echoed back in X-Request-ID.
+    """
+    incoming = request.headers.get(REQUEST_ID_HEADER)
+    request_id = incoming if incoming and _REQUEST_ID_PATTERN.fullmatch(incoming) else uuid.uuid4().hex
+    token = _request_id.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        _request_id.reset(token)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
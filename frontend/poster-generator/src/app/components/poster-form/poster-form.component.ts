@@ -19,9 +19,11 @@ export class PosterFormComponent {
     include_target_audience: false,
     include_cta_link: false,
     custom_prompt: '',
+    speculate: true, // Let the backend start rendering as soon as fields are ready
   };
 
   aiResponse: { [key: string]: string } = {}; // Generated fields from backend
+  speculationToken: string | null = null; // Claims the backend's pre-rendered poster
   posterBase64: string = ''; // Holds the final image (base64)
   isLoading: boolean = false; // Controls shimmer
 
@@ -37,6 +39,7 @@ export class PosterFormComponent {
         (res) => {
           console.log('Response from backend:', res);
           this.aiResponse = res?.data || {};
+          this.speculationToken = res?.speculation_token || null;
         },
         (err) => {
           console.error('Backend Error:', err);
@@ -49,6 +52,7 @@ export class PosterFormComponent {
     const payload = {
       fields: this.aiResponse,
       theme: this.form.theme,
+      speculation_token: this.speculationToken,
     };
 
     this.isLoading = true; // Start shimmer